@@ -0,0 +1,49 @@
+# Path: accounts/conditional.py
+
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def conditional_page(fingerprint):
+    """Answer conditional GETs (If-None-Match / If-Modified-Since) with 304 when nothing changed.
+
+    ``fingerprint(request, *args, **kwargs)`` returns ``(version parts, last modified)`` from a
+    few cheap reads, or None to always render. The ETag also covers the signed-in user and the
+    CSRF cookie, since the HTML depends on both, and pages with flash messages waiting are always
+    rendered. Responses are marked private/no-cache so browsers revalidate instead of guessing.
+    """
+    def fingerprinted(request, *args, **kwargs):
+        # @condition asks for the ETag and Last-Modified separately; compute both once
+        if not hasattr(request, '_page_fingerprint'):
+            result = None
+            if not len(get_messages(request)):
+                result = fingerprint(request, *args, **kwargs)
+            if result is not None:
+                parts, last_modified = result
+                raw = ':'.join(str(part) for part in (*parts, request.user.pk, request.META.get('CSRF_COOKIE', '')))
+                result = hashlib.sha1(raw.encode()).hexdigest(), last_modified
+            request._page_fingerprint = result
+        return request._page_fingerprint
+
+    def etag(request, *args, **kwargs):
+        result = fingerprinted(request, *args, **kwargs)
+        return result and result[0]
+
+    def last_modified(request, *args, **kwargs):
+        result = fingerprinted(request, *args, **kwargs)
+        return result and result[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,62 @@
+# Path: accounts/fragments.py
+
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import caches
+from django.db import transaction
+
+# The alias Django's {% cache %} tag uses; settings point it at the same backend as 'default'
+FRAGMENT_CACHE_ALIAS = 'template_fragments'
+
+
+def _version_key(model, pk, section):
+    return f"fragments:{model._meta.label_lower}:{pk}:{section}"
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def fragment_versions(model, pk, sections):
+    """section -> current version of an object's cached fragments, for use as {% cache %} vary keys or ETags.
+
+    Versions are the time of the last change in microseconds, so they also give a Last-Modified date
+    (see version_timestamp). A counter that was never set or got evicted starts at the current time,
+    which is later than any version it could have held before.
+    """
+    cache = caches[FRAGMENT_CACHE_ALIAS]
+    keys = {section: _version_key(model, pk, section) for section in sections}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for section, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = _now()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[section] = version
+    return versions
+
+
+def fragment_version(model, pk, section):
+    return fragment_versions(model, pk, [section])[section]
+
+
+def version_timestamp(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=timezone.utc)
+
+
+def bump_fragment_versions(model, pks, section):
+    """Invalidate a fragment section for the given objects once the current transaction commits"""
+    keys = [_version_key(model, pk, section) for pk in set(pks)]
+
+    def bump():
+        cache = caches[FRAGMENT_CACHE_ALIAS]
+        now = _now()
+        current = cache.get_many(keys)
+        # Always move forward, even if two changes land in the same microsecond
+        cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, None)
+
+    if keys:
+        transaction.on_commit(bump)
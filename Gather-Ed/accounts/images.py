@@ -0,0 +1,115 @@
+# Path: accounts/images.py
+
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from jobs.models import Job
+from jobs.queue import enqueue
+from PIL import Image, ImageOps
+
+# name -> (max width, max height, crop to exact size)
+VARIANT_SIZES = {
+    'avatar': (128, 128, True),
+    'list': (480, 480, False),
+    'full': (1600, 1600, False),
+}
+
+# format key -> (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+def _encode(image, fmt):
+    pil_format, extension, options = VARIANT_FORMATS[fmt]
+    buffer = BytesIO()
+    # Re-encoding without passing exif/icc info drops all source metadata
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue(), extension
+
+
+def _store(content, directory, extension):
+    """Save bytes under a content-hashed name, reusing an identical existing file"""
+    digest = hashlib.sha256(content).hexdigest()
+    name = f"{directory}/{digest[:2]}/{digest}.{extension}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def _prepare(source):
+    source = ImageOps.exif_transpose(source)
+    if source.mode not in ('RGB', 'L'):
+        source = source.convert('RGB')
+    return source
+
+
+def _resize(source, width, height, crop):
+    if crop:
+        return ImageOps.fit(source, (width, height), Image.Resampling.LANCZOS)
+    image = source.copy()
+    image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return image
+
+
+def render_image(field_file, width, height, crop=False, fmt='jpeg'):
+    """Resize a stored image to a single metadata-free variant; returns (bytes, extension)"""
+    field_file.open('rb')
+    try:
+        with Image.open(field_file) as source:
+            return _encode(_resize(_prepare(source), width, height, crop), fmt)
+    finally:
+        field_file.close()
+
+
+def build_variants(field_file, directory):
+    """Generate resized, metadata-free WebP/JPEG variants of an uploaded image.
+
+    Returns a dict like {'avatar': {'webp': path, 'jpeg': path, 'width': w, 'height': h}, ...}
+    """
+    field_file.open('rb')
+    try:
+        with Image.open(field_file) as source:
+            source = _prepare(source)
+
+            variants = {}
+            for name, (width, height, crop) in VARIANT_SIZES.items():
+                image = _resize(source, width, height, crop)
+                variant = {'width': image.width, 'height': image.height}
+                for fmt in VARIANT_FORMATS:
+                    content, extension = _encode(image, fmt)
+                    variant[fmt] = _store(content, directory, extension)
+                variants[name] = variant
+    finally:
+        field_file.close()
+    return variants
+
+
+class VariantImageMixin:
+    """Serve pre-generated image variants, falling back to the original upload"""
+    variant_source_field = None
+    variant_field = None
+
+    def schedule_variants(self):
+        """Queue variant generation for this instance's current image on the job worker"""
+        source = getattr(self, self.variant_source_field)
+        key = f"variants:{self._meta.label}:{self.pk}:{source.name}"
+        # The same file name can come back (the image cleared and uploaded again) after its
+        # variants were reset; a finished job must not stand in for the rebuild
+        Job.objects.filter(idempotency_key=key, status__in=[Job.DONE, Job.FAILED]).delete()
+        enqueue(
+            'accounts.process_image_variants',
+            {'model_label': self._meta.label, 'pk': self.pk},
+            key=key,
+        )
+
+    def variant_url(self, name, fmt='jpeg'):
+        source = getattr(self, self.variant_source_field)
+        if not source:
+            return ''
+        path = getattr(self, self.variant_field, {}).get(name, {}).get(fmt)
+        if path:
+            return default_storage.url(path)
+        return source.url
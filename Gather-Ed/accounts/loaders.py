@@ -0,0 +1,66 @@
+# Path: accounts/loaders.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User
+
+_current = ContextVar('user_loader', default=None)
+
+
+class UserLoader:
+    """Identity map for users, batching id lookups DataLoader-style.
+
+    Each user is fetched at most once per loader (together with their profile), and
+    every relation that points at them is handed the same instance.
+    """
+
+    def __init__(self):
+        self._users = {}
+
+    def prime(self, users):
+        for user in users:
+            self._users.setdefault(user.pk, user)
+
+    def load_many(self, user_ids):
+        """id -> User for the given ids, fetching any not seen yet in one query; unknown ids are left out"""
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        missing = {user_id for user_id in user_ids if user_id not in self._users}
+        if missing:
+            self.prime(User.objects.select_related('profile').filter(pk__in=missing))
+        return {user_id: self._users[user_id] for user_id in user_ids if user_id in self._users}
+
+    def load(self, user_id):
+        return self.load_many([user_id]).get(user_id)
+
+    def attach(self, objects, *fields):
+        """Fill the named user foreign keys on each object from the map, loading every missing user at once.
+
+        Objects without one of the fields are skipped for it, so mixed lists work.
+        """
+        objects = list(objects)
+        wanted = [
+            (obj, field, getattr(obj, f'{field}_id'))
+            for obj in objects
+            for field in fields
+            if hasattr(obj, f'{field}_id')
+        ]
+        users = self.load_many(user_id for _, _, user_id in wanted)
+        for obj, field, user_id in wanted:
+            if user_id in users:
+                setattr(obj, field, users[user_id])
+        return objects
+
+
+def get_user_loader():
+    """The current request's loader; outside a request (or user_loader_scope) each call gets a fresh one"""
+    return _current.get() or UserLoader()
+
+
+@contextmanager
+def user_loader_scope():
+    token = _current.set(UserLoader())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
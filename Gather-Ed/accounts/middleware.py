@@ -0,0 +1,17 @@
+# Path: accounts/middleware.py
+
+from .loaders import user_loader_scope
+
+
+class UserLoaderMiddleware:
+    """Give every request its own user identity map (see accounts.loaders)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with user_loader_scope() as users:
+            # The signed-in user is the one most likely to turn up again through relations
+            if request.user.is_authenticated:
+                users.prime([request.user])
+            return self.get_response(request)
@@ -0,0 +1,32 @@
+import accounts.models
+from django.db import migrations, models
+
+
+def fill_tokens(apps, schema_editor):
+    """AddField evaluates the default once, so give every existing profile its own token"""
+    Profile = apps.get_model('accounts', 'Profile')
+    profiles = list(Profile.objects.only('id'))
+    for profile in profiles:
+        profile.calendar_token = accounts.models.new_calendar_token()
+    Profile.objects.bulk_update(profiles, ['calendar_token'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='calendar_token',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='profile',
+            name='calendar_token',
+            field=models.CharField(default=accounts.models.new_calendar_token, editable=False, max_length=64, unique=True),
+        ),
+    ]
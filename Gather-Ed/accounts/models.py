@@ -1,14 +1,29 @@
+import secrets
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .fragments import bump_fragment_versions
+from .images import VariantImageMixin
+
+def new_calendar_token():
+    return secrets.token_urlsafe(24)
+
+
+class Profile(VariantImageMixin, models.Model):
+    variant_source_field = 'profile_picture'
+    variant_field = 'picture_variants'
 
-class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(max_length=500, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    picture_variants = models.JSONField(default=dict, blank=True)
     phone_number = models.CharField(max_length=15, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
+    # Secret part of the user's calendar feed URL; calendar apps can't sign in
+    calendar_token = models.CharField(max_length=64, unique=True, default=new_calendar_token, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -26,7 +41,10 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login; skip the profile write (and the fragment bumps it triggers)
+    if update_fields == {'last_login'}:
+        return
     instance.profile.save()
 
 
@@ -78,4 +96,38 @@ class UserRole(models.Model):
         unique_together = ['user', 'role']
 
     def __str__(self):
-        return f"{self.user.username} - {self.role.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.role.name}"
+
+
+def friend_ids(user_ids):
+    """Ids of everyone with an accepted friendship with any of the given users"""
+    user_ids = set(user_ids)
+    pairs = Friendship.objects.filter(
+        Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids),
+        status=Friendship.ACCEPTED,
+    ).values_list('from_user_id', 'to_user_id')
+    return {other for pair in pairs for other in pair if other not in user_ids}
+
+
+# Cached friends lists (see templates/accounts/friends.html) are versioned per user
+@receiver([post_save, post_delete], sender=Friendship)
+def friendship_changed(sender, instance, **kwargs):
+    bump_fragment_versions(User, [instance.from_user_id, instance.to_user_id], 'friends')
+
+
+@receiver([post_save, post_delete], sender=Role)
+def role_changed(sender, instance, **kwargs):
+    # The role picker on its creator's page and the badges of everyone holding it
+    holders = UserRole.objects.filter(role=instance).values_list('user_id', flat=True)
+    bump_fragment_versions(User, [instance.created_by_id, *friend_ids(holders)], 'friends')
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+def user_role_changed(sender, instance, **kwargs):
+    bump_fragment_versions(User, friend_ids([instance.user_id]), 'friends')
+
+
+@receiver(post_save, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    # Names and pictures appear on every friend's list
+    bump_fragment_versions(User, friend_ids([instance.user_id]), 'friends')
@@ -0,0 +1,31 @@
+# Path: accounts/tasks.py
+
+from django.apps import apps
+from django.db.models.signals import post_save
+from jobs.queue import task
+from .images import build_variants
+
+
+@task
+def process_image_variants(model_label, pk):
+    """Build and store variants for a VariantImageMixin model instance"""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    source = getattr(instance, model.variant_source_field)
+    if not source:
+        return
+    directory = source.field.upload_to.rstrip('/') + '/variants'
+    variants = build_variants(source, directory)
+    # Only store the result if the image wasn't replaced while we were working
+    updated = model.objects.filter(pk=pk, **{model.variant_source_field: source.name}).update(
+        **{model.variant_field: variants}
+    )
+    if updated:
+        # update() skips post_save, whose receivers bump the fragments that show the image
+        setattr(instance, model.variant_field, variants)
+        post_save.send(
+            sender=model, instance=instance, created=False, raw=False,
+            using=instance._state.db, update_fields=frozenset([model.variant_field]),
+        )
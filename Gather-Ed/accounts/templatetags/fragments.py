@@ -0,0 +1,11 @@
+from django import template
+
+from accounts.fragments import fragment_version as get_fragment_version
+
+register = template.Library()
+
+@register.simple_tag
+def fragment_version(obj, section):
+    """Version counter to vary a cached fragment on, e.g.
+    {% fragment_version event 'comments' as version %}{% cache 3600 event_comments event.id version %}"""
+    return get_fragment_version(obj._meta.model, obj.pk, section)
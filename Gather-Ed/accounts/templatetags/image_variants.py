@@ -0,0 +1,11 @@
+from django import template
+
+register = template.Library()
+
+@register.filter
+def variant(obj, spec):
+    """URL of a resized image variant, e.g. {{ profile|variant:"avatar" }} or {{ profile|variant:"avatar.webp" }}."""
+    if not obj:
+        return ''
+    name, _, fmt = spec.partition('.')
+    return obj.variant_url(name, fmt or 'jpeg')
@@ -5,9 +5,11 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
+from django.utils.functional import SimpleLazyObject
 from .forms import SignUpForm, LoginForm, ProfileUpdateForm, RoleForm
 from .models import Profile, Friendship, Role, UserRole
+from notifications.delivery import notify_friend_request
 from django.views.decorators.http import require_http_methods
 
 def signup_view(request):
@@ -94,7 +96,13 @@ def profile_edit_view(request):
     if request.method == 'POST':
         form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
         if form.is_valid():
-            form.save()
+            picture_changed = 'profile_picture' in form.changed_data
+            if picture_changed:
+                form.instance.picture_variants = {}
+            profile = form.save()
+            if picture_changed and profile.profile_picture:
+                # Resize/strip off the request thread
+                profile.schedule_variants()
             messages.success(request, 'Profile updated successfully!')
             return redirect('accounts:profile')
     else:
@@ -104,21 +112,13 @@ def profile_edit_view(request):
 
 @login_required
 def friends_view(request):
-    # All friendships where current user is involved and accepted
-    friendships = Friendship.objects.filter(
-        Q(from_user=request.user, status="accepted") |
-        Q(to_user=request.user, status="accepted")
-    ).select_related("from_user", "to_user")
-
-    # Extract the actual friends (the other user in the relation)
-    friends = []
-    for f in friendships:
-        if f.from_user == request.user:
-            friends.append(f.to_user)
-        else:
-            friends.append(f.from_user)
+    def load_friends():
+        friends = get_friends_for_user(request.user)
+        prefetch_related_objects(friends, 'profile', 'userrole_set__role')
+        return friends
 
-    friends = get_friends_for_user(request.user)  # Should return User objects
+    # Only loaded when the template's cached friends list is stale
+    friends = SimpleLazyObject(load_friends)
     roles = Role.objects.filter(created_by=request.user)
     pending_requests = get_pending_requests(request.user)
     return render(request, 'accounts/friends.html', {
@@ -126,22 +126,6 @@ def friends_view(request):
         'roles': roles,
         'pending_requests': pending_requests,
     })
-    # Remove invalid/null users just in case
-    friends = [friend for friend in friends if friend and friend.id]
-
-    pending_requests = Friendship.objects.filter(
-        to_user=request.user, status="pending"
-    ).select_related("from_user")
-
-    roles = Role.objects.filter(created_by=request.user)
-
-    context = {
-        "friends": friends,
-        "pending_requests": pending_requests,
-        "roles": roles,
-    }
-    return render(request, "accounts/friends.html", context)
-
 
 
 
@@ -162,7 +146,8 @@ def send_friend_request(request, user_id):
     if existing_friendship:
         messages.warning(request, "Friend request already exists!")
     else:
-        Friendship.objects.create(from_user=request.user, to_user=to_user)
+        friendship = Friendship.objects.create(from_user=request.user, to_user=to_user)
+        notify_friend_request(friendship)
         messages.success(request, f"Friend request sent to {to_user.username}!")
     
     return redirect('accounts:profile', user_id=user_id)
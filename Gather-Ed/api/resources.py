@@ -0,0 +1,261 @@
+# Path: api/resources.py
+
+import base64
+import binascii
+from decimal import Decimal
+
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import UserRole
+from bills.models import ExpenseShare
+from eventpollapp.models import DateVote, Event
+from eventpollapp.tiebreak import going_votes
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+CENT = Decimal('0.01')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Resource:
+    """How one model is exposed: field name -> values() path, which fields are returned by default,
+    and annotations that are only added to the query when a requested field needs them.
+
+    ``annotations`` maps an annotated path to a function ``(queryset, user)`` that adds it.
+    """
+
+    def __init__(self, fields, default, annotations=None, ordering='-id'):
+        self.fields = fields
+        self.default = default
+        self.annotations = annotations or {}
+        self.ordering = ordering
+
+    def select(self, request):
+        """Field names asked for with ?fields=a,b,c, or the default set"""
+        requested = request.GET.get('fields')
+        if not requested:
+            return self.default
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return names
+
+    def serialize(self, queryset, names, user):
+        """Rows for the requested fields only, read with a single values() query"""
+        paths = {self.fields[name] for name in names}
+        applied = set()
+        for path, annotate in self.annotations.items():
+            if path in paths and annotate not in applied:
+                queryset = annotate(queryset, user)
+                applied.add(annotate)
+        rows = queryset.values('id', *(paths - {'id'}))
+        return [{name: _compact(row[self.fields[name]]) for name in names} | {'_id': row['id']} for row in rows]
+
+    def page(self, request, queryset, user):
+        """One page of rows ordered by id, continuing after ?cursor= from the previous page"""
+        names = self.select(request)
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            raise ApiError('limit must be an integer')
+
+        cursor = request.GET.get('cursor')
+        if cursor:
+            last_id = decode_cursor(cursor)
+            queryset = queryset.filter(id__lt=last_id) if self.ordering == '-id' else queryset.filter(id__gt=last_id)
+        rows = self.serialize(queryset.order_by(self.ordering)[:limit + 1], names, user)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['_id'])
+        return {'data': [strip(row) for row in rows], 'next': next_cursor}
+
+    def one(self, request, queryset, user):
+        rows = self.serialize(queryset[:1], self.select(request), user)
+        if not rows:
+            raise ApiError('Not found', status=404)
+        return {'data': strip(rows[0])}
+
+
+def _compact(value):
+    # Every decimal exposed is money with two places; computed ones can come back from SQLite unscaled
+    if isinstance(value, Decimal):
+        return value.quantize(CENT)
+    return value
+
+
+def strip(row):
+    row.pop('_id', None)
+    return row
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError('Invalid cursor')
+
+
+def visible_events(user):
+    """Events the user may see: their own, open ones, and ones requiring a role they have"""
+    return Event.objects.filter(
+        Q(creator=user) |
+        Q(required_role__isnull=True) |
+        Q(required_role__in=UserRole.objects.filter(user=user).values('role'))
+    )
+
+
+EVENTS = Resource(
+    fields={
+        'id': 'id',
+        'title': 'title',
+        'description': 'description',
+        'location': 'location',
+        'creator': 'creator_id',
+        'required_role': 'required_role_id',
+        'is_date_finalized': 'is_date_finalized',
+        'finalized_date': 'finalized_date',
+        'duration_minutes': 'duration_minutes',
+        'poll_closes_at': 'poll_closes_at',
+        'recurrence': 'recurrence',
+        'tiebreak_policy': 'tiebreak_policy',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=['id', 'title', 'location', 'is_date_finalized', 'finalized_date', 'poll_closes_at', 'updated_at'],
+)
+
+DATE_OPTIONS = Resource(
+    fields={
+        'id': 'id',
+        'event': 'event_id',
+        'proposed_date': 'proposed_date',
+        'proposed_by': 'proposed_by_id',
+        'votes': 'num_votes',
+        'going': 'going_votes',
+        'voted': 'voted',
+        'created_at': 'created_at',
+    },
+    default=['id', 'proposed_date', 'votes', 'voted'],
+    annotations={
+        'num_votes': lambda queryset, user: queryset.annotate(num_votes=Coalesce(Subquery(
+            DateVote.objects.filter(date_option=OuterRef('pk')).order_by().values('date_option').annotate(
+                c=Count('id')
+            ).values('c')
+        ), 0)),
+        'going_votes': lambda queryset, user: queryset.annotate(going_votes=Coalesce(going_votes(), 0)),
+        'voted': lambda queryset, user: queryset.annotate(
+            voted=Exists(DateVote.objects.filter(date_option=OuterRef('pk'), user=user))
+        ),
+    },
+    ordering='id',
+)
+
+REQUIREMENTS = Resource(
+    fields={
+        'id': 'id',
+        'event': 'event_id',
+        'requirement_type': 'requirement_type',
+        'title': 'title',
+        'description': 'description',
+        'added_by': 'added_by_id',
+        'assigned_to': 'assigned_to_id',
+        'is_completed': 'is_completed',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=['id', 'requirement_type', 'title', 'assigned_to', 'is_completed'],
+)
+
+COMMENTS = Resource(
+    fields={
+        'id': 'id',
+        'event': 'event_id',
+        'user': 'user_id',
+        'username': 'user__username',
+        'content': 'content',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=['id', 'user', 'username', 'content', 'created_at'],
+)
+
+
+def _with_summary(queryset, user):
+    return queryset.with_summary(user)
+
+
+BILLS = Resource(
+    fields={
+        'id': 'id',
+        'event': 'event_id',
+        'title': 'title',
+        'description': 'description',
+        'total_amount': 'total_amount',
+        'currency': 'currency',
+        'created_by': 'created_by_id',
+        'is_settled': 'is_settled',
+        'settled_at': 'settled_at',
+        'revision': 'revision',
+        'balance': 'user_balance',
+        'expense_count': 'expense_count',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=['id', 'event', 'title', 'total_amount', 'currency', 'is_settled', 'balance'],
+    annotations={
+        # Both come from the same with_summary() subqueries
+        'user_balance': _with_summary,
+        'expense_count': _with_summary,
+    },
+)
+
+EXPENSES = Resource(
+    fields={
+        'id': 'id',
+        'bill': 'bill_id',
+        'description': 'description',
+        'amount': 'amount',
+        'currency': 'currency',
+        'original_amount': 'original_amount',
+        'paid_by': 'paid_by_id',
+        'split_method': 'split_method',
+        'your_share': 'your_share',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=['id', 'description', 'amount', 'paid_by', 'your_share', 'created_at'],
+    annotations={
+        'your_share': lambda queryset, user: queryset.annotate(your_share=Subquery(
+            ExpenseShare.objects.filter(expense=OuterRef('pk'), user=user).values('amount')[:1]
+        )),
+    },
+)
+
+SETTLEMENTS = Resource(
+    fields={
+        'id': 'id',
+        'bill': 'bill_id',
+        'from_user': 'from_user_id',
+        'to_user': 'to_user_id',
+        'amount': 'amount',
+        'notes': 'notes',
+        'is_confirmed': 'is_confirmed',
+        'confirmed_at': 'confirmed_at',
+        'created_at': 'created_at',
+    },
+    default=['id', 'bill', 'from_user', 'to_user', 'amount', 'is_confirmed', 'created_at'],
+)
+
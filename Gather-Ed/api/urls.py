@@ -0,0 +1,22 @@
+from django.urls import include, path
+from . import views
+
+app_name = 'api'
+
+v1 = [
+    path('events/', views.events, name='events'),
+    path('events/<int:event_id>/', views.event_detail, name='event_detail'),
+    path('events/<int:event_id>/options/', views.event_options, name='event_options'),
+    path('events/<int:event_id>/votes/', views.event_votes, name='event_votes'),
+    path('events/<int:event_id>/requirements/', views.event_requirements, name='event_requirements'),
+    path('events/<int:event_id>/comments/', views.event_comments, name='event_comments'),
+    path('bills/', views.bills, name='bills'),
+    path('bills/<int:bill_id>/', views.bill_detail, name='bill_detail'),
+    path('bills/<int:bill_id>/expenses/', views.bill_expenses, name='bill_expenses'),
+    path('bills/<int:bill_id>/settlements/', views.bill_settlements, name='bill_settlements'),
+    path('settlements/', views.settlements, name='settlements'),
+]
+
+urlpatterns = [
+    path('v1/', include((v1, 'v1'))),
+]
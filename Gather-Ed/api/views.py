@@ -0,0 +1,290 @@
+# Path: api/views.py
+
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.http import JsonResponse
+
+from accounts.fragments import bump_fragment_versions
+from bills import importers
+from bills.models import Bill, Expense, Settlement
+from eventpollapp.forms import EventCommentForm
+from eventpollapp.models import DateOption, DateVote, Event, EventComment, EventRequirement
+from notifications.delivery import notify_comment, notify_votes
+from .resources import (
+    BILLS, COMMENTS, DATE_OPTIONS, EVENTS, EXPENSES, REQUIREMENTS, SETTLEMENTS, ApiError, visible_events,
+)
+
+MAX_BULK_ITEMS = 500
+
+
+def respond(payload, status=200):
+    return JsonResponse(payload, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def api_view(*methods):
+    """Session-authenticated JSON endpoint: 401 for anonymous users, 405 for other methods,
+    and ApiError turned into an error response"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return respond({'error': 'Authentication required'}, status=401)
+            if request.method not in methods:
+                response = respond({'error': f'Method {request.method} not allowed'}, status=405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return respond({'error': str(error)}, status=error.status)
+        return wrapper
+    return decorator
+
+
+def read_json(request):
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise ApiError('Invalid JSON')
+
+
+def read_ids(value, name):
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        raise ApiError(f'{name} must be a list of integers')
+    if len(value) > MAX_BULK_ITEMS:
+        raise ApiError(f'At most {MAX_BULK_ITEMS} items per request')
+    return value
+
+
+def read_list(data):
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise ApiError('Expected a list of objects')
+    if len(data) > MAX_BULK_ITEMS:
+        raise ApiError(f'At most {MAX_BULK_ITEMS} items per request')
+    return data
+
+
+def read_bool(request, name):
+    value = request.GET.get(name)
+    if value is None:
+        return None
+    if value not in ('true', 'false'):
+        raise ApiError(f'{name} must be true or false')
+    return value == 'true'
+
+
+def get_event(user, event_id):
+    event = visible_events(user).filter(pk=event_id).first()
+    if event is None:
+        raise ApiError('Not found', status=404)
+    return event
+
+
+def visible_bills(user):
+    return Bill.objects.involving(user) | Bill.objects.filter(created_by=user)
+
+
+def get_bill(user, bill_id):
+    bill = visible_bills(user).filter(pk=bill_id).first()
+    if bill is None:
+        raise ApiError('Not found', status=404)
+    return bill
+
+
+@api_view('GET')
+def events(request):
+    """Events the user can see; ?finalized=true|false"""
+    queryset = visible_events(request.user)
+    finalized = read_bool(request, 'finalized')
+    if finalized is not None:
+        queryset = queryset.filter(is_date_finalized=finalized)
+    return respond(EVENTS.page(request, queryset, request.user))
+
+
+@api_view('GET')
+def event_detail(request, event_id):
+    return respond(EVENTS.one(request, visible_events(request.user).filter(pk=event_id), request.user))
+
+
+@api_view('GET')
+def event_options(request, event_id):
+    event = get_event(request.user, event_id)
+    return respond(DATE_OPTIONS.page(request, DateOption.objects.filter(event=event), request.user))
+
+
+@api_view('POST')
+def event_votes(request, event_id):
+    """Add and remove the user's votes in one go: {"add": [option ids], "remove": [option ids]}.
+
+    Answers with the event's date options and their updated tallies.
+    """
+    event = get_event(request.user, event_id)
+    if event.is_date_finalized:
+        raise ApiError('Event date is already finalized')
+    if event.is_poll_closed:
+        raise ApiError('Voting has closed for this event')
+
+    data = read_json(request)
+    if not isinstance(data, dict):
+        raise ApiError('Expected an object with add and remove lists')
+    add, remove = read_ids(data.get('add'), 'add'), read_ids(data.get('remove'), 'remove')
+    requested = set(add) | set(remove)
+    found = set(DateOption.objects.filter(event=event, id__in=requested).values_list('id', flat=True))
+    if requested - found:
+        raise ApiError(f"Unknown date option(s): {', '.join(map(str, sorted(requested - found)))}")
+
+    with transaction.atomic():
+        already = set(
+            DateVote.objects.filter(user=request.user, date_option_id__in=add).values_list('date_option_id', flat=True)
+        )
+        DateVote.objects.bulk_create(
+            [DateVote(date_option_id=option_id, user=request.user) for option_id in set(add)],
+            ignore_conflicts=True,
+        )
+        DateVote.objects.filter(user=request.user, date_option_id__in=set(remove) - set(add)).delete()
+        # bulk_create skips the receiver that versions the votes section
+        bump_fragment_versions(Event, [event.id], 'votes')
+        notify_votes(event, request.user, count=len(set(add) - already))
+
+    return respond(DATE_OPTIONS.page(request, DateOption.objects.filter(event=event), request.user))
+
+
+@api_view('GET', 'PATCH')
+def event_requirements(request, event_id):
+    """List requirements, or PATCH [{"id": 1, "is_completed": true}, ...] to tick off several at once.
+
+    Requirements the user can't change (they need to have added it, be assigned to it or
+    own the event) are reported as skipped.
+    """
+    event = get_event(request.user, event_id)
+    if request.method == 'GET':
+        return respond(REQUIREMENTS.page(request, EventRequirement.objects.filter(event=event), request.user))
+
+    changes = {}
+    for item in read_list(read_json(request)):
+        if not isinstance(item.get('id'), int) or not isinstance(item.get('is_completed'), bool):
+            raise ApiError('Each item needs an integer id and a boolean is_completed')
+        changes[item['id']] = item['is_completed']
+
+    requirements = list(EventRequirement.objects.filter(event=event, id__in=changes))
+    allowed = [
+        requirement for requirement in requirements
+        if request.user.id in (requirement.added_by_id, requirement.assigned_to_id, event.creator_id)
+    ]
+    for requirement in allowed:
+        requirement.is_completed = changes[requirement.id]
+    with transaction.atomic():
+        EventRequirement.objects.bulk_update(allowed, ['is_completed'])
+        bump_fragment_versions(Event, [event.id], 'requirements')
+
+    processed = {requirement.id for requirement in allowed}
+    return respond({
+        'processed': sorted(processed),
+        'skipped': sorted(set(changes) - processed),
+    })
+
+
+@api_view('GET', 'POST')
+def event_comments(request, event_id):
+    """Comments newest first, or POST {"content": "..."} to add one"""
+    event = get_event(request.user, event_id)
+    if request.method == 'GET':
+        return respond(COMMENTS.page(request, EventComment.objects.filter(event=event), request.user))
+
+    data = read_json(request)
+    form = EventCommentForm(data if isinstance(data, dict) else {})
+    if not form.is_valid():
+        return respond({'error': 'Invalid comment', 'fields': form.errors}, status=400)
+    comment = form.save(commit=False)
+    comment.event = event
+    comment.user = request.user
+    comment.save()
+    notify_comment(comment)
+    return respond(COMMENTS.one(request, EventComment.objects.filter(pk=comment.pk), request.user), status=201)
+
+
+@api_view('GET')
+def bills(request):
+    """Bills the user is on; ?event=<id>, ?settled=true|false"""
+    queryset = visible_bills(request.user)
+    if 'event' in request.GET:
+        try:
+            queryset = queryset.filter(event_id=int(request.GET['event']))
+        except ValueError:
+            raise ApiError('event must be an integer')
+    settled = read_bool(request, 'settled')
+    if settled is not None:
+        queryset = queryset.filter(is_settled=settled)
+    return respond(BILLS.page(request, queryset, request.user))
+
+
+@api_view('GET')
+def bill_detail(request, bill_id):
+    return respond(BILLS.one(request, visible_bills(request.user).filter(pk=bill_id), request.user))
+
+
+@api_view('GET', 'POST')
+def bill_expenses(request, bill_id):
+    """List expenses, or POST a list of expenses to add them in bulk.
+
+    Each item has description, amount and optional paid_by (username, default the
+    user) and shared_by (usernames, default everyone on the event). Items go through
+    the same batched importer as file uploads; invalid ones are reported, the rest saved.
+    """
+    bill = get_bill(request.user, bill_id)
+    if request.method == 'GET':
+        return respond(EXPENSES.page(request, Expense.objects.filter(bill=bill), request.user))
+
+    # Items of the wrong shape are reported alongside the importer's own row errors
+    rows, errors = [], []
+    for number, item in enumerate(read_list(read_json(request)), start=1):
+        shared_by = item.get('shared_by') or []
+        amount = item.get('amount')
+        if not isinstance(shared_by, list) or not all(isinstance(username, str) for username in shared_by):
+            errors.append((number, 'shared_by must be a list of usernames'))
+        elif amount is not None and (isinstance(amount, bool) or not isinstance(amount, (str, int, float))):
+            errors.append((number, 'amount must be a number or a string'))
+        else:
+            rows.append((number, {
+                'description': str(item.get('description') or '').strip(),
+                'amount': str(amount if amount is not None else ''),
+                'paid_by': str(item.get('paid_by') or ''),
+                'shared_by': shared_by,
+            }))
+
+    result = importers.import_expenses(bill, rows, request.user) if rows else importers.ImportResult()
+    return respond({
+        'created': result.created,
+        'skipped': result.skipped,
+        'errors': sorted(errors + result.errors),
+    }, status=201 if result.created else 400)
+
+
+@api_view('GET')
+def bill_settlements(request, bill_id):
+    bill = get_bill(request.user, bill_id)
+    return respond(SETTLEMENTS.page(request, Settlement.objects.filter(bill=bill), request.user))
+
+
+@api_view('GET', 'POST')
+def settlements(request):
+    """The user's settlements (?pending=true for ones waiting on their confirmation), or
+    POST {"action": "confirm"|"reject", "ids": [...]} to resolve received ones in bulk"""
+    if request.method == 'GET':
+        if read_bool(request, 'pending'):
+            queryset = Settlement.objects.filter(to_user=request.user, is_confirmed=False)
+        else:
+            queryset = Settlement.objects.filter(from_user=request.user) | Settlement.objects.filter(to_user=request.user)
+        return respond(SETTLEMENTS.page(request, queryset, request.user))
+
+    data = read_json(request)
+    if not isinstance(data, dict) or data.get('action') not in ('confirm', 'reject'):
+        raise ApiError("action must be 'confirm' or 'reject'")
+    processed, skipped, settled_bills = Settlement.resolve_batch(
+        request.user, data['action'], sorted(set(read_ids(data.get('ids'), 'ids')))
+    )
+    return respond({'processed': processed, 'skipped': skipped, 'settled_bills': settled_bills})
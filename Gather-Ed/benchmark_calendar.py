@@ -0,0 +1,100 @@
+import os
+import django
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lusu_project.settings')
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.contrib.auth.models import User
+from django.utils import timezone
+from eventpollapp.models import Event, EventOccurrence, EventParticipant
+from eventpollapp import recurrence
+
+RULES = [
+    'FREQ=WEEKLY',
+    'FREQ=WEEKLY;BYDAY=MO,TH',
+    'FREQ=WEEKLY;INTERVAL=2',
+    'FREQ=DAILY',
+    'FREQ=DAILY;INTERVAL=3',
+    'FREQ=MONTHLY',
+    'FREQ=WEEKLY;COUNT=500',
+]
+
+def build_series(series, user, other):
+    now = timezone.now()
+    events = Event.objects.bulk_create([
+        Event(
+            title=f'Series {i}', description='', creator=user, is_date_finalized=True,
+            # Started up to three years ago, so expansion can't just walk from the first date
+            finalized_date=now - timedelta(days=random.randint(30, 3 * 365), hours=random.randint(0, 23)),
+            recurrence=random.choice(RULES),
+        )
+        for i in range(series)
+    ])
+    for event in events:
+        event.recurrence_end = event.compute_recurrence_end()
+    Event.objects.bulk_update(events, ['recurrence_end'])
+    EventParticipant.objects.bulk_create([EventParticipant(event=event, user=other, status='going') for event in events])
+
+    # A few cancelled or moved dates around this month in every series
+    overrides = []
+    for event in events:
+        for original in list(recurrence.Rule.parse(event.recurrence).between(event.finalized_date, now - timedelta(days=10), now + timedelta(days=40)))[:3]:
+            moved = random.random() < 0.5
+            overrides.append(EventOccurrence(
+                event=event, original_start=original,
+                start=original + timedelta(days=1) if moved else None, is_cancelled=not moved,
+            ))
+    EventOccurrence.objects.bulk_create(overrides)
+    return len(overrides)
+
+def benchmark_calendar(series=500, renders=20):
+    print(f"Benchmarking the dashboard month view with {series} recurring series...")
+
+    # Run against a throwaway test database, never the real one
+    old_name = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user('bench', password='password')
+        other = User.objects.create_user('bench2', password='password')
+        override_count = build_series(series, user, other)
+
+        client = Client()
+        client.force_login(other)
+        now = timezone.localtime()
+        url = f'/dashboard/?month={now.month}&year={now.year}'
+        client.get(url)
+
+        timings = []
+        for _ in range(renders):
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            timings.append(time.perf_counter() - start)
+
+        month_start = timezone.make_aware(timezone.datetime(now.year, now.month, 1))
+        month_end = timezone.make_aware(timezone.datetime(now.year + now.month // 12, now.month % 12 + 1, 1))
+        events = list(Event.objects.filter(participants__user=other))
+        start = time.perf_counter()
+        occurrences = recurrence.expand(events, month_start, month_end)
+        expanded = time.perf_counter() - start
+
+        print(f"Series:      {series} ({override_count} overrides)")
+        print(f"Occurrences: {len(occurrences)} in {now:%B %Y}")
+        print(f"Render:      {statistics.median(timings) * 1000:.1f}ms median, {max(timings) * 1000:.1f}ms max (status {response.status_code})")
+        print(f"Expansion:   {expanded * 1000:.1f}ms for the month, without rendering")
+        print(f"Queries:     {len(queries)} per render")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+if __name__ == "__main__":
+    benchmark_calendar(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,57 @@
+import os
+import django
+import io
+import random
+import sys
+import time
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lusu_project.settings')
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from eventpollapp.models import Event, EventParticipant
+from bills.models import Bill
+from bills import importers
+
+def build_csv(rows, usernames):
+    buffer = io.StringIO()
+    buffer.write("description,amount,paid_by,shared_by\n")
+    for i in range(rows):
+        shared = ';'.join(random.sample(usernames, random.randint(1, len(usernames))))
+        buffer.write(f"Expense {i},{random.randint(100, 50000) / 100:.2f},{random.choice(usernames)},{shared}\n")
+    buffer.seek(0)
+    return buffer
+
+def benchmark_import(rows=100_000):
+    print(f"Benchmarking bulk import of {rows} expense rows...")
+
+    # Run against a throwaway test database, never the real one
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        users = [User.objects.create_user(f'bench{i}', password='password') for i in range(6)]
+        event = Event.objects.create(title='Benchmark trip', description='', creator=users[0], is_date_finalized=True)
+        for user in users[1:]:
+            EventParticipant.objects.create(event=event, user=user, status='going')
+        bill = Bill.objects.create(event=event, title='Benchmark bill', created_by=users[0])
+
+        csv_file = build_csv(rows, [user.username for user in users])
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = importers.import_expenses(bill, importers.read_csv(csv_file), users[0])
+        elapsed = time.perf_counter() - start
+
+        bill.refresh_from_db()
+        print(f"Imported:  {result.created} expenses ({result.error_count} errors)")
+        print(f"Elapsed:   {elapsed:.2f}s ({result.created / elapsed:,.0f} rows/s)")
+        print(f"Queries:   {len(queries)}")
+        print(f"Total:     ${bill.total_amount}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+if __name__ == "__main__":
+    benchmark_import(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
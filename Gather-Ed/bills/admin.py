@@ -1,19 +1,23 @@
 from django.contrib import admin
-from .models import Bill, Expense, Settlement, BillParticipant
+from .models import Bill, Expense, ExpenseShare, ExchangeRate, Receipt, Settlement, BillParticipant
 
 @admin.register(Bill)
 class BillAdmin(admin.ModelAdmin):
-    list_display = ['title', 'event', 'created_by', 'total_amount', 'is_settled', 'created_at']
-    list_filter = ['is_settled', 'created_at']
+    list_display = ['title', 'event', 'created_by', 'total_amount', 'currency', 'is_settled', 'created_at']
+    list_filter = ['is_settled', 'currency', 'created_at']
     search_fields = ['title', 'event__title', 'created_by__username']
-    readonly_fields = ['total_amount', 'created_at', 'updated_at']
+    readonly_fields = ['total_amount', 'revision', 'created_at', 'updated_at']
+
+class ExpenseShareInline(admin.TabularInline):
+    model = ExpenseShare
+    extra = 0
 
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
-    list_display = ['description', 'bill', 'amount', 'paid_by', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['description', 'bill', 'amount', 'currency', 'original_amount', 'paid_by', 'split_method', 'created_at']
+    list_filter = ['split_method', 'created_at']
     search_fields = ['description', 'bill__title', 'paid_by__username']
-    filter_horizontal = ['shared_by']
+    inlines = [ExpenseShareInline]
 
 @admin.register(Settlement)
 class SettlementAdmin(admin.ModelAdmin):
@@ -25,4 +29,16 @@ class SettlementAdmin(admin.ModelAdmin):
 class BillParticipantAdmin(admin.ModelAdmin):
     list_display = ['user', 'bill', 'joined_at']
     list_filter = ['joined_at']
-    search_fields = ['user__username', 'bill__title']
\ No newline at end of file
+    search_fields = ['user__username', 'bill__title']
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['currency', 'date', 'rate']
+    list_filter = ['currency']
+    date_hierarchy = 'date'
+
+@admin.register(Receipt)
+class ReceiptAdmin(admin.ModelAdmin):
+    list_display = ['name', 'ref_count', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'ref_count', 'created_at']
@@ -0,0 +1,186 @@
+# Path: bills/currency.py
+
+import bisect
+import csv
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.utils import timezone
+
+from .splitting import from_minor, to_minor
+
+DEFAULT_CURRENCY = getattr(settings, 'DEFAULT_CURRENCY', 'USD')
+# Stored rates are units of each currency per one unit of this currency (the ECB publishes against EUR)
+RATE_BASE_CURRENCY = getattr(settings, 'FX_RATE_BASE_CURRENCY', 'EUR')
+RATE_CACHE_SECONDS = getattr(settings, 'FX_RATE_CACHE_SECONDS', 300)
+
+CURRENCIES = [
+    ('USD', 'US Dollar'),
+    ('EUR', 'Euro'),
+    ('GBP', 'British Pound'),
+    ('CAD', 'Canadian Dollar'),
+    ('AUD', 'Australian Dollar'),
+    ('NZD', 'New Zealand Dollar'),
+    ('CHF', 'Swiss Franc'),
+    ('SEK', 'Swedish Krona'),
+    ('NOK', 'Norwegian Krone'),
+    ('DKK', 'Danish Krone'),
+    ('PLN', 'Polish Zloty'),
+    ('CZK', 'Czech Koruna'),
+    ('MXN', 'Mexican Peso'),
+    ('CNY', 'Chinese Yuan'),
+    ('INR', 'Indian Rupee'),
+    ('THB', 'Thai Baht'),
+    ('JPY', 'Japanese Yen'),
+    ('KRW', 'South Korean Won'),
+    ('ISK', 'Icelandic Krona'),
+]
+
+SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'CNY': '¥', 'INR': '₹', 'KRW': '₩', 'THB': '฿'}
+
+# ISO 4217 currencies without a minor unit; everything else above uses cents
+ZERO_DECIMAL_CURRENCIES = {'JPY', 'KRW', 'ISK'}
+
+
+class RateNotFound(LookupError):
+    pass
+
+
+def minor_exponent(currency):
+    """Number of decimal places in the currency's minor unit"""
+    return 0 if currency in ZERO_DECIMAL_CURRENCIES else 2
+
+
+def symbol(currency):
+    return SYMBOLS.get(currency, '')
+
+
+# In-memory rate cache: currency -> (sorted dates, rates), loaded one currency at a time
+_series = {}
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def clear_rate_cache():
+    global _loaded_at
+    with _lock:
+        _series.clear()
+        _loaded_at = time.monotonic()
+
+
+def _rate_series(currency):
+    from .models import ExchangeRate
+
+    if time.monotonic() - _loaded_at > RATE_CACHE_SECONDS:
+        # Pick up rates loaded by other processes
+        clear_rate_cache()
+    series = _series.get(currency)
+    if series is None:
+        rows = list(ExchangeRate.objects.filter(currency=currency).order_by('date').values_list('date', 'rate'))
+        series = ([row[0] for row in rows], [row[1] for row in rows])
+        with _lock:
+            _series[currency] = series
+    return series
+
+
+def _base_rate(currency, on_date):
+    """Units of ``currency`` per RATE_BASE_CURRENCY on the latest rate date on or before ``on_date``"""
+    if currency == RATE_BASE_CURRENCY:
+        return Decimal(1)
+    dates, rates = _rate_series(currency)
+    index = bisect.bisect_right(dates, on_date) - 1
+    if index < 0:
+        raise RateNotFound(f"No {currency} exchange rate on or before {on_date}.")
+    return rates[index]
+
+
+def get_rate(from_currency, to_currency, on_date=None):
+    """Units of ``to_currency`` per one ``from_currency``, using the stored rate for ``on_date`` (default today)"""
+    if from_currency == to_currency:
+        return Decimal(1)
+    if on_date is None:
+        on_date = timezone.localdate()
+    elif isinstance(on_date, datetime):
+        on_date = timezone.localtime(on_date).date() if timezone.is_aware(on_date) else on_date.date()
+    return _base_rate(to_currency, on_date) / _base_rate(from_currency, on_date)
+
+
+def convert_minor(units, from_currency, to_currency, rate):
+    """Convert an integer amount of ``from_currency`` minor units to ``to_currency`` minor units"""
+    shift = minor_exponent(to_currency) - minor_exponent(from_currency)
+    return int((Decimal(units).scaleb(shift) * rate).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def convert(amount, from_currency, to_currency, on_date=None, rate=None):
+    """Convert a Decimal amount, rounded to the target currency's minor unit"""
+    if rate is None:
+        rate = get_rate(from_currency, to_currency, on_date)
+    units = to_minor(amount, minor_exponent(from_currency))
+    return from_minor(convert_minor(units, from_currency, to_currency, rate), minor_exponent(to_currency))
+
+
+def read_rates(text_file):
+    """Yield (date, currency, rate) from a rates CSV.
+
+    Accepts either the ECB history layout (a Date column followed by one column per
+    currency) or a long layout with date, currency and rate columns. Blank and
+    'N/A' cells are skipped.
+    """
+    reader = csv.reader(text_file)
+    header = [name.strip() for name in next(reader, [])]
+    lowered = [name.lower() for name in header]
+    if not header or lowered[0] != 'date':
+        raise ValueError("The first column must be 'date'.")
+
+    long_format = lowered[1:3] == ['currency', 'rate']
+    for row in reader:
+        if not row or not row[0].strip():
+            continue
+        if long_format and len(row) < 3:
+            raise ValueError(f"Line {reader.line_num}: expected date, currency and rate columns.")
+        try:
+            day = date.fromisoformat(row[0].strip())
+        except ValueError:
+            raise ValueError(f"Line {reader.line_num}: invalid date '{row[0].strip()}'.")
+        pairs = [(row[1], row[2])] if long_format else zip(header[1:], row[1:])
+        for currency, value in pairs:
+            currency, value = currency.strip().upper(), value.strip()
+            if not currency or value in ('', 'N/A'):
+                continue
+            try:
+                rate = Decimal(value)
+            except InvalidOperation:
+                raise ValueError(f"Invalid rate '{value}' for {currency} on {day}.")
+            if rate <= 0:
+                raise ValueError(f"Rate for {currency} on {day} must be positive.")
+            yield day, currency, rate
+
+
+def load_rates(rows, batch_size=2000):
+    """Insert or update (date, currency, rate) rows in batches; returns the number of rows written"""
+    from .models import ExchangeRate
+
+    count = 0
+    batch = []
+
+    def flush():
+        ExchangeRate.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['currency', 'date'],
+            update_fields=['rate'],
+        )
+        batch.clear()
+
+    for day, currency, rate in rows:
+        batch.append(ExchangeRate(date=day, currency=currency, rate=rate))
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    clear_rate_cache()
+    return count
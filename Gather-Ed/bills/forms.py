@@ -2,15 +2,18 @@ from django import forms
 from django.contrib.auth.models import User
 from eventpollapp.models import Event
 from .models import Bill, Expense, Settlement
+from .currency import CURRENCIES, RateNotFound, minor_exponent
+from .splitting import EQUAL, WEIGHTED, SplitError, split_minor, to_minor
 from django.db.models import Q
 
 class BillForm(forms.ModelForm):
     class Meta:
         model = Bill
-        fields = ['title', 'description']
+        fields = ['title', 'description', 'currency']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'currency': forms.Select(attrs={'class': 'form-control'}),
         }
 
     def __init__(self, user, *args, **kwargs):
@@ -28,19 +31,27 @@ class BillForm(forms.ModelForm):
 
 
 class ExpenseForm(forms.ModelForm):
+    shared_by = forms.ModelMultipleChoiceField(
+        queryset=User.objects.none(),
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+        error_messages={'required': 'Select at least one person to share this expense.'},
+    )
+
     class Meta:
         model = Expense
-        fields = ['description', 'amount', 'paid_by', 'shared_by', 'receipt_image']
+        fields = ['description', 'amount', 'currency', 'paid_by', 'split_method', 'receipt_image']
         widgets = {
             'description': forms.TextInput(attrs={'class': 'form-control'}),
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0'}),
+            'currency': forms.Select(attrs={'class': 'form-select', 'style': 'max-width: 8rem;'}),
             'paid_by': forms.Select(attrs={'class': 'form-control'}),
-            'shared_by': forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+            'split_method': forms.Select(attrs={'class': 'form-control'}),
             'receipt_image': forms.FileInput(attrs={'class': 'form-control'}),
         }
 
     def __init__(self, bill, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.bill = bill
         # Get event participants for this bill
         event_participants = User.objects.filter(
             Q(created_events=bill.event) | Q(eventparticipant__event=bill.event)
@@ -48,10 +59,83 @@ class ExpenseForm(forms.ModelForm):
         
         self.fields['paid_by'].queryset = event_participants
         self.fields['shared_by'].queryset = event_participants
-        
-        # Pre-select all participants for shared_by by default
-        if not self.instance.pk:
-            self.fields['shared_by'].initial = event_participants
+        self.participants = list(event_participants)
+
+        # The amount is entered in the currency paid; blank means the bill's own currency
+        self.fields['currency'].choices = [('', bill.currency)] + [
+            (code, code) for code, _ in CURRENCIES if code != bill.currency
+        ]
+        if self.instance.original_amount is not None:
+            self.initial['amount'] = self.instance.original_amount
+
+        existing = {}
+        if self.instance.pk:
+            existing = dict(self.instance.shares.values_list('user_id', 'weight'))
+            self.fields['shared_by'].initial = list(existing)
+        else:
+            # Pre-select all participants for shared_by by default
+            self.fields['shared_by'].initial = [user.id for user in self.participants]
+
+        # One weight per participant: a share, percent or exact amount depending on split_method
+        for user in self.participants:
+            self.fields[f'share_{user.id}'] = forms.DecimalField(
+                required=False,
+                min_value=0,
+                max_digits=10,
+                decimal_places=2,
+                initial=existing.get(user.id),
+                widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': '0.01', 'min': '0'}),
+            )
+
+    def share_rows(self):
+        """(user, checkbox, weight field) for each participant, for rendering the split table"""
+        checkboxes = {int(choice.data['value'].value): choice for choice in self['shared_by']}
+        return [(user, checkboxes.get(user.id), self[f'share_{user.id}']) for user in self.participants]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        amount = cleaned_data.get('amount')
+        currency = cleaned_data.get('currency') or ''
+        if currency == self.bill.currency:
+            currency = ''
+        if amount is None:
+            return cleaned_data
+
+        if not self.instance.pk or {'amount', 'currency'} & set(self.changed_data):
+            try:
+                self.instance.set_original_amount(amount, currency, self.bill.currency)
+            except RateNotFound as error:
+                self.add_error('currency', str(error))
+                return cleaned_data
+        # The model stores the converted amount; what was entered stays in original_amount
+        cleaned_data['amount'] = self.instance.amount
+        cleaned_data['currency'] = self.instance.currency
+
+        shared_by = cleaned_data.get('shared_by')
+        method = cleaned_data.get('split_method') or EQUAL
+        if not shared_by:
+            return cleaned_data
+
+        weights = {}
+        for user in shared_by:
+            weight = cleaned_data.get(f'share_{user.id}')
+            if weight is None:
+                # An unfilled weight counts as one share, but has no meaning as a percent or amount
+                weight = 1 if method == WEIGHTED else 0
+            weights[user.id] = weight
+        # Validate in the currency paid, which is what exact amounts are entered in
+        exponent = minor_exponent(currency or self.bill.currency)
+        try:
+            split_minor(to_minor(amount, exponent), method, list(weights.values()), exponent)
+        except SplitError as error:
+            raise forms.ValidationError(str(error))
+        self.share_weights = weights
+        return cleaned_data
+
+    def _save_m2m(self):
+        # Called by save(), or by save_m2m() after save(commit=False)
+        super()._save_m2m()
+        self.instance.set_shares(self.share_weights, self.cleaned_data['split_method'])
 
 
 class SettlementForm(forms.ModelForm):
@@ -107,4 +191,17 @@ class BillFilterForm(forms.Form):
         for event in user_events:
             event_choices.append((event.id, event.title))
         
-        self.fields['event'].choices = event_choices
\ No newline at end of file
+        self.fields['event'].choices = event_choices
+
+
+class ExpenseImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV (description, amount, paid_by, shared_by)'),
+        ('ofx', 'Bank statement (OFX/QFX)'),
+    ]
+
+    file = forms.FileField(widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.ofx,.qfx'}))
+    file_format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
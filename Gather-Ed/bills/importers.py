@@ -0,0 +1,202 @@
+# Path: bills/importers.py
+
+import csv
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from .currency import minor_exponent
+from .models import Expense, ExpenseShare, ledger_changed
+from .splitting import EQUAL, from_minor, split_amount, to_minor
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)  # (row number, message)
+    error_count: int = 0
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+class RowError(ValueError):
+    pass
+
+
+_AMOUNT_FIELD = Expense._meta.get_field('amount')
+# Largest amount the column holds, e.g. 99999999.99 for max_digits=10, decimal_places=2
+MAX_AMOUNT = Decimal(10) ** (_AMOUNT_FIELD.max_digits - _AMOUNT_FIELD.decimal_places) - Decimal('0.01')
+
+
+def _parse_amount(value):
+    # NaN, inf and friends get past Decimal() but not comparisons or quantize(), so all of it is guarded
+    try:
+        amount = Decimal(str(value).strip().replace('$', '').replace(',', ''))
+        if not amount.is_finite():
+            raise RowError(f"Invalid amount '{value}'")
+        if amount <= 0:
+            raise RowError(f"Amount must be positive, got {amount}")
+        amount = amount.quantize(Decimal('0.01'))
+    except (InvalidOperation, AttributeError):
+        raise RowError(f"Invalid amount '{value}'")
+    if amount > MAX_AMOUNT:
+        raise RowError(f"Amount {amount} is larger than the maximum of {MAX_AMOUNT}")
+    return amount
+
+
+def read_csv(text_file):
+    """Yield (row number, dict) from a CSV with description, amount, paid_by and optional shared_by columns.
+
+    shared_by is a ';'-separated list of usernames; blank means everyone on the event.
+    """
+    reader = csv.DictReader(text_file)
+    missing = {'description', 'amount'} - {name.strip().lower() for name in reader.fieldnames or []}
+    if missing:
+        raise RowError(f"Missing column(s): {', '.join(sorted(missing))}")
+    for row in reader:
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        yield reader.line_num, {
+            'description': row.get('description', ''),
+            'amount': row.get('amount', ''),
+            'paid_by': row.get('paid_by', ''),
+            'shared_by': [name for name in re.split(r'[;|]', row.get('shared_by', '')) if name.strip()],
+        }
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)')
+
+
+def read_ofx(text_file):
+    """Yield (transaction number, dict) for each debit in an OFX/QFX bank statement.
+
+    Statements belong to the person importing them, so paid_by is left blank and
+    resolved to the importing user. Credits are yielded with ``credit`` set and
+    skipped by the importer.
+    """
+    number = 0
+    current = None
+    for line in text_file:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {}
+                elif current is not None:
+                    number += 1
+                    amount = current.get('TRNAMT', '')
+                    # Debits are negative in OFX; expenses are positive
+                    debit = amount.startswith('-')
+                    yield number, {
+                        'description': current.get('NAME') or current.get('MEMO') or 'Imported transaction',
+                        'amount': amount[1:] if debit else amount,
+                        'paid_by': '',
+                        'shared_by': [],
+                        'credit': not debit,
+                    }
+                    current = None
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+}
+
+
+def _event_members(bill):
+    """username -> user id for everyone who can be on the bill's expenses"""
+    return dict(
+        User.objects.filter(
+            Q(created_events=bill.event) | Q(eventparticipant__event=bill.event)
+        ).distinct().values_list('username', 'id')
+    )
+
+
+def import_expenses(bill, rows, default_payer, batch_size=BATCH_SIZE):
+    """Create expenses from parsed rows with batched bulk inserts.
+
+    Expenses and their equal shares are inserted with bulk_create per batch, and the
+    bill total is recalculated once at the end instead of per expense. Invalid rows are
+    reported and skipped; the rest of the file is still imported.
+    """
+    members = _event_members(bill)
+    everyone = list(members.values())
+    exponent = minor_exponent(bill.currency)
+    result = ImportResult()
+    pending = []
+
+    def flush():
+        expenses = Expense.objects.bulk_create([expense for expense, _ in pending], batch_size=batch_size)
+        ExpenseShare.objects.bulk_create(
+            [
+                ExpenseShare(expense_id=expense.id, user_id=user_id, amount=amount)
+                for expense, (_, shared_ids) in zip(expenses, pending)
+                for user_id, amount in zip(shared_ids, split_amount(expense.amount, EQUAL, shared_ids, exponent))
+            ],
+            batch_size=batch_size * 4,
+        )
+        result.created += len(expenses)
+        pending.clear()
+
+    with transaction.atomic():
+        try:
+            for row_number, row in rows:
+                if row.get('credit'):
+                    # Credits on a bank statement aren't expenses
+                    result.skipped += 1
+                    continue
+                try:
+                    description = row['description'][:200]
+                    if not description:
+                        raise RowError("Description is required")
+                    # Rounded to the bill currency's minor unit (whole yen etc.)
+                    amount = from_minor(to_minor(_parse_amount(row['amount']), exponent), exponent)
+
+                    payer = row['paid_by']
+                    payer_id = members.get(payer) if payer else default_payer.id
+                    if payer_id is None:
+                        raise RowError(f"'{payer}' is not part of this event")
+
+                    shared_ids = []
+                    for username in row['shared_by']:
+                        user_id = members.get(username.strip())
+                        if user_id is None:
+                            raise RowError(f"'{username.strip()}' is not part of this event")
+                        shared_ids.append(user_id)
+                    # A name listed twice would be a second share for the same user
+                    shared_ids = list(dict.fromkeys(shared_ids))
+                except RowError as error:
+                    result.add_error(row_number, str(error))
+                    continue
+
+                pending.append((
+                    Expense(bill=bill, description=description, amount=amount, paid_by_id=payer_id),
+                    shared_ids or everyone,
+                ))
+                if len(pending) >= batch_size:
+                    flush()
+        except RowError as error:
+            # Problems with the file as a whole (e.g. missing columns)
+            result.add_error(0, str(error))
+        except (csv.Error, UnicodeDecodeError) as error:
+            result.add_error(0, f"Could not read file: {error}")
+
+        if pending:
+            flush()
+        if result.created:
+            # bulk_create skips Expense.save() and its receivers, so the total and revision are refreshed once here
+            bill.calculate_total()
+            ledger_changed(bill.id)
+
+    return result
@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from bills.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Find bills whose stored total has drifted from the sum of their expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted totals from the expense sum')
+
+    def handle(self, *args, **options):
+        # One aggregate query over all bills; only drifted rows come back
+        drifted = Bill.objects.annotate(
+            expected=Coalesce(Sum('expenses__amount'), Value(Decimal('0.00')), output_field=DecimalField())
+        ).exclude(total_amount=F('expected')).order_by('id')
+
+        count = 0
+        for bill in drifted.iterator():
+            count += 1
+            self.stdout.write(
+                f"Bill #{bill.id} '{bill.title}': stored {bill.total_amount}, expenses sum to {bill.expected}"
+            )
+            if options['fix']:
+                Bill.objects.filter(pk=bill.pk).update(total_amount=bill.expected)
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS('All bill totals are consistent.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {count} bill(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{count} bill(s) drifted. Run with --fix to repair.'))
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from bills.models import Expense, Receipt
+from bills.receipts import RECEIPT_DIR, THUMBNAIL_DIR, receipt_digest
+from bills.tasks import delete_orphan_receipt
+
+# An upload is saved before the expense that points at it, so leave recent files alone
+GRACE_MINUTES = 60
+
+
+def _walk(directory):
+    """Every file name under a storage directory"""
+    if not default_storage.exists(directory):
+        return
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield f"{directory}/{name}"
+    for child in directories:
+        yield from _walk(f"{directory}/{child}")
+
+
+def _modified_before(name, cutoff):
+    if not default_storage.exists(name):
+        return True
+    return default_storage.get_modified_time(name) < cutoff
+
+
+class Command(BaseCommand):
+    help = 'Repair receipt reference counts and delete receipt files no expense uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument(
+            '--grace-minutes', type=int, default=GRACE_MINUTES,
+            help='Only delete unreferenced files last modified at least this long ago',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        # Reference counts recomputed from the expenses in one grouped query
+        actual = dict(
+            Expense.objects.exclude(receipt_image='').exclude(receipt_image__isnull=True).order_by()
+            .values_list('receipt_image').annotate(count=Count('id'))
+        )
+        stored = dict(Receipt.objects.values_list('name', 'ref_count'))
+        drifted = {name: count for name, count in actual.items() if stored.get(name) != count}
+        drifted.update({name: 0 for name, count in stored.items() if count and name not in actual})
+        for name, count in drifted.items():
+            self.stdout.write(f"{name}: stored {stored.get(name, 'nothing')}, used by {count}")
+            if not dry_run:
+                Receipt.objects.update_or_create(name=name, defaults={'ref_count': count})
+
+        # Files without any reference, including thumbnails of receipts that are gone
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        orphans = [name for name, count in stored.items() if not actual.get(name) and _modified_before(name, cutoff)]
+        live_digests = {receipt_digest(name) for name in actual}
+        stray = [
+            name for name in _walk(RECEIPT_DIR)
+            if name not in actual and name not in stored
+            and not (name.startswith(THUMBNAIL_DIR + '/') and receipt_digest(name).rsplit('-', 1)[0] in live_digests)
+            and _modified_before(name, cutoff)
+        ]
+        for name in orphans:
+            self.stdout.write(f"Orphaned receipt {name}")
+        for name in stray:
+            self.stdout.write(f"Unreferenced file {name}")
+        if not dry_run:
+            for name in orphans:
+                # Re-checks ref_count and the expenses per name, in case one picked the receipt up since
+                delete_orphan_receipt(name)
+            for name in stray:
+                default_storage.delete(name)
+
+        if dry_run:
+            summary = f"Would repair {len(drifted)} count(s) and remove {len(orphans)} orphaned receipt(s)"
+        else:
+            summary = f"Repaired {len(drifted)} count(s) and removed {len(orphans)} orphaned receipt(s)"
+        self.stdout.write(self.style.SUCCESS(f"{summary} and {len(stray)} unreferenced file(s)."))
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from bills import importers
+from bills.models import Bill
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import expenses into a bill from a CSV or OFX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bill_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(importers.READERS), default=None,
+                            help='File format (defaults to the file extension)')
+        parser.add_argument('--payer', help='Username used when a row has no paid_by (defaults to the bill creator)')
+        parser.add_argument('--batch-size', type=int, default=importers.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            bill = Bill.objects.select_related('event', 'created_by').get(pk=options['bill_id'])
+        except Bill.DoesNotExist:
+            raise CommandError(f"Bill {options['bill_id']} does not exist")
+
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format == 'qfx':
+            file_format = 'ofx'
+        if file_format not in importers.READERS:
+            raise CommandError(f"Unknown format '{file_format}', use --format")
+
+        payer = bill.created_by
+        if options['payer']:
+            payer = User.objects.filter(username=options['payer']).first()
+            if payer is None:
+                raise CommandError(f"User '{options['payer']}' does not exist")
+
+        with open(options['path'], encoding='utf-8-sig', errors='replace', newline='') as text_file:
+            rows = importers.READERS[file_format](text_file)
+            result = importers.import_expenses(bill, rows, payer, batch_size=options['batch_size'])
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} expenses ({result.skipped} skipped, {result.error_count} errors)"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bills.currency import RATE_BASE_CURRENCY, load_rates, read_rates
+
+
+class Command(BaseCommand):
+    help = 'Load daily exchange rates from a CSV file (ECB history layout or date,currency,rate)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help=f'Rates per one {RATE_BASE_CURRENCY}, one row per date')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as text_file:
+                count = load_rates(read_rates(text_file), batch_size=options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"Loaded {count} exchange rates"))
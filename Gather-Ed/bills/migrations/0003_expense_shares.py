@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_shared_by(apps, schema_editor):
+    """Turn the old plain shared_by rows into equal ExpenseShare rows with stored amounts"""
+    Expense = apps.get_model('bills', 'Expense')
+    ExpenseShare = apps.get_model('bills', 'ExpenseShare')
+    Through = Expense.shared_by.through
+
+    members = {}
+    for expense_id, user_id in Through.objects.order_by('expense_id', 'user_id').values_list('expense_id', 'user_id'):
+        members.setdefault(expense_id, []).append(user_id)
+
+    shares = []
+    for expense in Expense.objects.filter(id__in=members).only('id', 'amount').iterator():
+        user_ids = members[expense.id]
+        total_cents = int(round(expense.amount * 100))
+        part, extra = divmod(total_cents, len(user_ids))
+        for index, user_id in enumerate(user_ids):
+            cents = part + (1 if index < extra else 0)
+            shares.append(ExpenseShare(expense_id=expense.id, user_id=user_id, amount=Decimal(cents) / 100))
+    ExpenseShare.objects.bulk_create(shares, batch_size=1000)
+
+
+def copy_shares_back(apps, schema_editor):
+    Expense = apps.get_model('bills', 'Expense')
+    ExpenseShare = apps.get_model('bills', 'ExpenseShare')
+    Through = Expense.shared_by.through
+    Through.objects.bulk_create(
+        [
+            Through(expense_id=expense_id, user_id=user_id)
+            for expense_id, user_id in ExpenseShare.objects.values_list('expense_id', 'user_id')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0002_expense_receipt_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='split_method',
+            field=models.CharField(choices=[('equal', 'Split equally'), ('weighted', 'By shares (e.g. 2 for a couple)'), ('percentage', 'By percentage'), ('exact', 'Exact amounts')], default='equal', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ExpenseShare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.DecimalField(decimal_places=2, default=1, max_digits=10)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shares', to='bills.expense')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_shares', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('expense', 'user')},
+            },
+        ),
+        migrations.RunPython(copy_shared_by, copy_shares_back),
+        # Django can't add through= to an existing many-to-many, so the field is swapped out
+        migrations.RemoveField(
+            model_name='expense',
+            name='shared_by',
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='shared_by',
+            field=models.ManyToManyField(related_name='shared_expenses', through='bills.ExpenseShare', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
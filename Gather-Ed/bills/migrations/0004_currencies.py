@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0003_expense_shares'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='currency',
+            field=models.CharField(choices=[('USD', 'US Dollar'), ('EUR', 'Euro'), ('GBP', 'British Pound'), ('CAD', 'Canadian Dollar'), ('AUD', 'Australian Dollar'), ('NZD', 'New Zealand Dollar'), ('CHF', 'Swiss Franc'), ('SEK', 'Swedish Krona'), ('NOK', 'Norwegian Krone'), ('DKK', 'Danish Krone'), ('PLN', 'Polish Zloty'), ('CZK', 'Czech Koruna'), ('MXN', 'Mexican Peso'), ('CNY', 'Chinese Yuan'), ('INR', 'Indian Rupee'), ('THB', 'Thai Baht'), ('JPY', 'Japanese Yen'), ('KRW', 'South Korean Won'), ('ISK', 'Icelandic Krona')], default='USD', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='currency',
+            field=models.CharField(blank=True, choices=[('USD', 'US Dollar'), ('EUR', 'Euro'), ('GBP', 'British Pound'), ('CAD', 'Canadian Dollar'), ('AUD', 'Australian Dollar'), ('NZD', 'New Zealand Dollar'), ('CHF', 'Swiss Franc'), ('SEK', 'Swedish Krona'), ('NOK', 'Norwegian Krone'), ('DKK', 'Danish Krone'), ('PLN', 'Polish Zloty'), ('CZK', 'Czech Koruna'), ('MXN', 'Mexican Peso'), ('CNY', 'Chinese Yuan'), ('INR', 'Indian Rupee'), ('THB', 'Thai Baht'), ('JPY', 'Japanese Yen'), ('KRW', 'South Korean Won'), ('ISK', 'Icelandic Krona')], max_length=3),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='exchange_rate',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=18, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='original_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+            options={
+                'ordering': ['currency', '-date'],
+                'unique_together': {('currency', 'date')},
+            },
+        ),
+    ]
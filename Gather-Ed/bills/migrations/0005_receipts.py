@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_receipts(apps, schema_editor):
+    Expense = apps.get_model('bills', 'Expense')
+    Receipt = apps.get_model('bills', 'Receipt')
+    references = Expense.objects.exclude(receipt_image='').exclude(receipt_image__isnull=True).order_by().values(
+        'receipt_image'
+    ).annotate(count=Count('id'))
+    Receipt.objects.bulk_create(
+        [Receipt(name=row['receipt_image'], ref_count=row['count']) for row in references],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0004_currencies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(count_existing_receipts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='expense',
+            name='receipt_variants',
+        ),
+    ]
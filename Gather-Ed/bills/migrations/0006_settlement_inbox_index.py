@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0005_receipts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['to_user', 'is_confirmed'], name='settlement_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0006_settlement_inbox_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='settled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SettledBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('bill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='final_balances', to='bills.bill')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='settled_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('bill', 'user')},
+            },
+        ),
+    ]
@@ -1,64 +1,296 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
 from django.contrib.auth.models import User
-from eventpollapp.models import Event
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from accounts.loaders import get_user_loader
+from eventpollapp.models import Event, EventParticipant
+from jobs.queue import enqueue
+from .currency import CURRENCIES, DEFAULT_CURRENCY, clear_rate_cache, convert, get_rate, minor_exponent
+from .receipts import store_receipt
+from .splitting import EQUAL, EXACT, SPLIT_METHODS, allocate, from_minor, split_amount, to_minor
 from decimal import Decimal
 from collections import defaultdict
 
+ZERO = Decimal('0.00')
+
+
+def _money(expression):
+    return Coalesce(expression, Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class BillQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Bills for events the user created or joined (no join fan-out, so no DISTINCT needed)"""
+        return self.filter(
+            Q(event__creator=user) |
+            Q(event__in=EventParticipant.objects.filter(user=user).values('event'))
+        )
+
+    def involving(self, user):
+        """visible_to() plus bills the user has been added to directly"""
+        return self.filter(
+            Q(event__creator=user) |
+            Q(event__in=EventParticipant.objects.filter(user=user).values('event')) |
+            Q(pk__in=BillParticipant.objects.filter(user=user).values('bill'))
+        )
+
+    def with_summary(self, user):
+        """Annotate expense_count and the user's outstanding balance using correlated subqueries.
+
+        Everything is computed in the same SELECT as the bills themselves, so the
+        number of queries doesn't grow with the number of bills. Settled bills read the
+        balance frozen when they were settled and skip the subqueries.
+        """
+        expense_count = Expense.objects.filter(bill=OuterRef('pk')).order_by().values('bill').annotate(
+            c=Count('id')
+        ).values('c')
+
+        paid = Expense.objects.filter(bill=OuterRef('pk'), paid_by=user).order_by().values('bill').annotate(
+            total=Sum('amount')
+        ).values('total')
+
+        owed = ExpenseShare.objects.filter(user=user, expense__bill=OuterRef('pk')).order_by().values(
+            'expense__bill'
+        ).annotate(total=Sum('amount')).values('total')
+
+        confirmed = Settlement.objects.filter(bill=OuterRef('pk'), is_confirmed=True).order_by()
+        sent = confirmed.filter(from_user=user).values('bill').annotate(total=Sum('amount')).values('total')
+        received = confirmed.filter(to_user=user).values('bill').annotate(total=Sum('amount')).values('total')
+
+        money = DecimalField(max_digits=12, decimal_places=2)
+        computed = Round(
+            _money(Subquery(paid)) - _money(Subquery(owed)) + _money(Subquery(sent)) - _money(Subquery(received)),
+            2,
+            output_field=money,
+        )
+        frozen = SettledBalance.objects.filter(bill=OuterRef('pk'), user=user).values('amount')[:1]
+
+        return self.annotate(
+            expense_count=Coalesce(Subquery(expense_count), Value(0)),
+            user_balance=Case(
+                When(is_settled=True, settled_at__isnull=False, then=_money(Subquery(frozen))),
+                default=computed,
+                output_field=money,
+            ),
+        )
+
+
+# Bill columns a full save() leaves alone
+DB_MAINTAINED_FIELDS = {'revision', 'total_amount'}
+
+
 class Bill(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='bills')
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Every amount on the bill (totals, shares, settlements) is in this currency
+    currency = models.CharField(max_length=3, choices=CURRENCIES, default=DEFAULT_CURRENCY)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     is_settled = models.BooleanField(default=False)
+    # Set when settled through mark_settled(), which also freezes the balances as SettledBalance rows
+    settled_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by ledger_changed() whenever an expense, share or settlement changes; keys SplitSnapshot
+    revision = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BillQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.event.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        # revision and total_amount are only ever changed in the database (bump_revision, adjust_total,
+        # calculate_total's explicit update_fields); a full save of a stale instance mustn't roll them back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in DB_MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_revision(cls, bill_id):
+        cls.objects.filter(pk=bill_id).update(revision=F('revision') + 1, updated_at=timezone.now())
+
+    @classmethod
+    def adjust_total(cls, bill_id, delta):
+        """Apply an expense change to the stored total with a single database-side UPDATE"""
+        if delta:
+            cls.objects.filter(pk=bill_id).update(
+                total_amount=F('total_amount') + delta,
+                updated_at=timezone.now(),
+            )
+
+    def expense_sum(self):
+        """Sum of all expenses, computed by the database"""
+        return self.expenses.aggregate(total=_money(Sum('amount')))['total']
+
     def calculate_total(self):
-        """Calculate total amount from all expenses"""
-        total = sum(expense.amount for expense in self.expenses.all())
+        """Recalculate the total from scratch; used to repair drift"""
+        total = self.expense_sum()
         self.total_amount = total
-        self.save()
+        self.save(update_fields=['total_amount', 'updated_at'])
         return total
 
+    def ledger_entries(self):
+        """Every money movement on the bill as (user_id, kind, amount) rows, in one UNION ALL query.
+
+        kinds: 'paid' (paid for an expense), 'share' (owes a share of an expense),
+        'sent'/'received' (confirmed settlements) and 'sent_pending'/'received_pending'.
+        """
+        paid = Expense.objects.filter(bill=self).annotate(
+            uid=F('paid_by_id'), kind=Value('paid'), value=F('amount'),
+        ).values_list('uid', 'kind', 'value')
+
+        shares = ExpenseShare.objects.filter(expense__bill=self).annotate(
+            uid=F('user_id'), kind=Value('share'), value=F('amount'),
+        ).values_list('uid', 'kind', 'value')
+
+        settlements = Settlement.objects.filter(bill=self)
+        sent = settlements.annotate(
+            uid=F('from_user_id'),
+            kind=Case(When(is_confirmed=True, then=Value('sent')), default=Value('sent_pending')),
+            value=F('amount'),
+        ).values_list('uid', 'kind', 'value')
+        received = settlements.annotate(
+            uid=F('to_user_id'),
+            kind=Case(When(is_confirmed=True, then=Value('received')), default=Value('received_pending')),
+            value=F('amount'),
+        ).values_list('uid', 'kind', 'value')
+
+        return paid.order_by().union(
+            shares.order_by(), sent.order_by(), received.order_by(), all=True
+        )
+
+    def _ledger_totals(self):
+        """user id -> ledger kind -> summed amount"""
+        totals = defaultdict(lambda: defaultdict(Decimal))
+        for user_id, kind, amount in self.ledger_entries():
+            totals[user_id][kind] += Decimal(str(amount))
+        return totals
+
+    def current_balances(self):
+        """user id -> outstanding balance after confirmed settlements (positive = owed money)"""
+        return {
+            user_id: round(kinds['paid'] - kinds['share'] + kinds['sent'] - kinds['received'], 2)
+            for user_id, kinds in self._ledger_totals().items()
+        }
+
+    def mark_settled(self, balances=None):
+        """Settle the bill and freeze its balances; returns True if it wasn't settled already"""
+        if balances is None:
+            balances = self.current_balances()
+        now = timezone.now()
+        with transaction.atomic():
+            marked = Bill.objects.filter(pk=self.pk, is_settled=False).update(
+                is_settled=True, settled_at=now, updated_at=now
+            )
+            if marked:
+                self.final_balances.all().delete()
+                SettledBalance.objects.bulk_create([
+                    SettledBalance(bill=self, user_id=user_id, amount=balance)
+                    for user_id, balance in balances.items()
+                ])
+        if marked:
+            self.is_settled, self.settled_at = True, now
+            invalidate_summaries(self.pk)
+        return bool(marked)
+
+    def reopen(self):
+        """Unsettle the bill and drop the frozen balances"""
+        with transaction.atomic():
+            reopened = Bill.objects.filter(pk=self.pk, is_settled=True).update(
+                is_settled=False, settled_at=None, updated_at=timezone.now()
+            )
+            self.final_balances.all().delete()
+        if reopened:
+            self.is_settled, self.settled_at = False, None
+            invalidate_summaries(self.pk)
+        return bool(reopened)
+
+    def update_settled_status(self):
+        """Mark the bill settled once every balance is zero; returns True if it was marked"""
+        if self.is_settled:
+            return False
+        balances = self.current_balances()
+        if not balances or any(balances.values()):
+            return False
+        return self.mark_settled(balances)
+
+    @classmethod
+    def check_settled(cls, bill_id):
+        """Re-evaluate a bill after its expenses, shares or settlements changed.
+
+        The frozen balances of a settled bill no longer hold once its ledger changes,
+        so it is reopened and then settled again only if everything still nets to zero.
+        """
+        bill = cls.objects.filter(pk=bill_id).first()
+        if bill is None:
+            return
+        if bill.is_settled:
+            bill.reopen()
+        bill.update_settled_status()
+
+    def split_data(self):
+        """get_split_calculation(), served from the snapshot of the bill's current revision.
+
+        The split is computed at most once per revision; a settled bill reads its frozen balances.
+        """
+        if not (self.is_settled and self.settled_at):
+            return self.split_snapshot()
+        rows = get_user_loader().attach(self.final_balances.all(), 'user')
+        balances = {row.user: row.amount for row in rows}
+        return {
+            'balances': balances,
+            'projected_balances': balances,
+            'settlements': [],
+            'total_amount': self.total_amount,
+        }
+
+    def split_snapshot(self):
+        revision = self.revision
+        data = SplitSnapshot.objects.filter(bill=self, revision=revision).values_list('data', flat=True).first()
+        if data is not None:
+            return SplitSnapshot.unpack(data, self.total_amount)
+
+        split = self.get_split_calculation()
+        SplitSnapshot.objects.bulk_create(
+            [SplitSnapshot(bill=self, revision=revision, data=SplitSnapshot.pack(split))],
+            ignore_conflicts=True,
+        )
+        # Nothing reads older revisions again
+        SplitSnapshot.objects.filter(bill=self, revision__lt=revision).delete()
+        return split
+
     def get_split_calculation(self):
-        """Calculate who owes whom and how much"""
-        expenses = self.expenses.all()
-        participants = set()
-        
-        # Collect all participants
-        for expense in expenses:
-            participants.add(expense.paid_by)
-            participants.update(expense.shared_by.all())
-        
-        if not participants:
+        """Calculate who owes whom and how much, net of confirmed settlements.
+
+        'balances' is what is still outstanding; 'projected_balances' additionally
+        assumes pending settlements will be confirmed.
+        """
+        totals = self._ledger_totals()
+        if not totals:
             return {}
-        
-        # Calculate total expenses per person
-        person_expenses = defaultdict(Decimal)
-        person_payments = defaultdict(Decimal)
-        
-        for expense in expenses:
-            # Add to what this person paid
-            person_payments[expense.paid_by] += expense.amount
-            
-            # Calculate how much each person should pay
-            shared_by_count = expense.shared_by.count()
-            if shared_by_count > 0:
-                amount_per_person = expense.amount / shared_by_count
-                for person in expense.shared_by.all():
-                    person_expenses[person] += amount_per_person
-        
-        # Calculate net balances (positive = owed money, negative = owes money)
+
+        users = get_user_loader().load_many(totals.keys())
+
+        # Net balances (positive = owed money, negative = owes money)
         balances = {}
-        for person in participants:
-            balances[person] = person_payments[person] - person_expenses[person]
+        projected_balances = {}
+        for user_id, kinds in totals.items():
+            person = users[user_id]
+            balance = kinds['paid'] - kinds['share'] + kinds['sent'] - kinds['received']
+            balances[person] = balance
+            projected_balances[person] = balance + kinds['sent_pending'] - kinds['received_pending']
         
         # Calculate settlements (who pays whom)
         settlements = []
@@ -91,6 +323,7 @@ class Bill(models.Model):
         
         return {
             'balances': {person: round(balance, 2) for person, balance in balances.items()},
+            'projected_balances': {person: round(balance, 2) for person, balance in projected_balances.items()},
             'settlements': settlements,
             'total_amount': self.total_amount
         }
@@ -99,9 +332,15 @@ class Bill(models.Model):
 class Expense(models.Model):
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='expenses')
     description = models.CharField(max_length=200)
+    # Always in the bill currency; what was actually paid is kept in original_amount/currency
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=CURRENCIES, blank=True)  # blank = bill currency
+    original_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    exchange_rate = models.DecimalField(max_digits=18, decimal_places=8, null=True, blank=True)
     paid_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses_paid')
-    shared_by = models.ManyToManyField(User, related_name='shared_expenses')
+    shared_by = models.ManyToManyField(User, through='ExpenseShare', related_name='shared_expenses')
+    split_method = models.CharField(max_length=10, choices=SPLIT_METHODS, default=EQUAL)
+    # Stored content-addressed (see bills.receipts), so identical uploads share one file
     receipt_image = models.ImageField(upload_to='receipts/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -112,13 +351,166 @@ class Expense(models.Model):
     def __str__(self):
         return f"{self.description} - ${self.amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored amount so save() can apply just the difference to the bill total
+        loaded = dict(zip(field_names, values))
+        instance._loaded_bill_id = loaded.get('bill_id')
+        instance._loaded_amount = loaded.get('amount')
+        if 'receipt_image' in loaded:
+            instance._loaded_receipt = loaded['receipt_image'] or ''
+        return instance
+
+    def save(self, *args, **kwargs):
+        previous_bill_id = previous_amount = None
+        previous_receipt = ''
+        if not self._state.adding:
+            previous_bill_id = getattr(self, '_loaded_bill_id', None)
+            previous_amount = getattr(self, '_loaded_amount', None)
+            previous_receipt = getattr(self, '_loaded_receipt', None)
+            if previous_bill_id is None or previous_amount is None or previous_receipt is None:
+                previous_bill_id, previous_amount, previous_receipt = Expense.objects.filter(
+                    pk=self.pk
+                ).values_list('bill_id', 'amount', 'receipt_image').first() or (None, None, '')
+                previous_receipt = previous_receipt or ''
+
+        receipt = self.receipt_image
+        if receipt and not receipt._committed:
+            # Store the upload by content hash instead of letting the field save another copy
+            receipt.name = store_receipt(receipt)
+            receipt._committed = True
+
+        amount = Decimal(str(self.amount))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current_receipt = self.receipt_image.name or ''
+            if current_receipt != previous_receipt:
+                if current_receipt:
+                    Receipt.acquire(current_receipt)
+                if previous_receipt:
+                    Receipt.release(previous_receipt)
+            if previous_bill_id is not None and previous_bill_id != self.bill_id:
+                Bill.adjust_total(previous_bill_id, -previous_amount)
+                Bill.adjust_total(self.bill_id, amount)
+            else:
+                Bill.adjust_total(self.bill_id, amount - (previous_amount or 0))
+            if previous_amount is not None and previous_amount != amount:
+                self.recalculate_shares()
+
+        self._loaded_bill_id = self.bill_id
+        self._loaded_amount = amount
+        self._loaded_receipt = self.receipt_image.name or ''
+
+    def delete(self, *args, **kwargs):
+        bill_id = self.bill_id
+        amount = getattr(self, '_loaded_amount', None)
+        if amount is None:
+            amount = self.amount
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Bill.adjust_total(bill_id, -Decimal(str(amount)))
+        return result
+
     def amount_per_person(self):
-        """Calculate amount per person for this expense"""
-        shared_count = self.shared_by.count()
+        """Calculate amount per person for this expense (before rounding to cents)"""
+        shared_count = len(self.shares.all())
         if shared_count == 0:
             return 0
         return self.amount / shared_count
 
+    def set_original_amount(self, original_amount, currency, bill_currency):
+        """Record what was paid in ``currency`` and store its value in the bill currency.
+
+        The rate for the expense date (today for new expenses) is looked up once and
+        kept, so later rate updates don't change existing expenses. Raises RateNotFound.
+        """
+        if not currency or currency == bill_currency:
+            self.currency = ''
+            self.original_amount = None
+            self.exchange_rate = None
+            exponent = minor_exponent(bill_currency)
+            self.amount = from_minor(to_minor(original_amount, exponent), exponent)
+            return
+        rate = get_rate(currency, bill_currency, self.created_at)
+        self.currency = currency
+        self.original_amount = original_amount
+        self.exchange_rate = rate.quantize(Decimal('0.00000001'))
+        self.amount = convert(original_amount, currency, bill_currency, rate=self.exchange_rate)
+
+    def set_shares(self, weights, method=None):
+        """Replace who shares this expense.
+
+        ``weights`` maps user id -> weight, whose meaning depends on the split method
+        (see bills.splitting). Raises SplitError if the split is invalid.
+        """
+        method = method or self.split_method
+        user_ids = list(weights)
+        values = [weights[user_id] for user_id in user_ids]
+        exponent = minor_exponent(self.bill.currency)
+        if method == EXACT and self.currency:
+            # Exact amounts are in the currency paid: check them there, then split the
+            # converted amount in the same proportions so the shares still add up
+            split_amount(self.original_amount, EXACT, values, minor_exponent(self.currency))
+            amounts = [from_minor(units, exponent) for units in allocate(to_minor(self.amount, exponent), values)]
+        else:
+            amounts = split_amount(self.amount, method, values, exponent)
+        with transaction.atomic():
+            if method != self.split_method:
+                self.split_method = method
+                Expense.objects.filter(pk=self.pk).update(split_method=method)
+            self.shares.all().delete()
+            ExpenseShare.objects.bulk_create([
+                ExpenseShare(
+                    expense=self,
+                    user_id=user_id,
+                    weight=1 if method == EQUAL else weights[user_id],
+                    amount=amount,
+                )
+                for user_id, amount in zip(user_ids, amounts)
+            ])
+        ledger_changed(self.bill_id)
+
+    def recalculate_shares(self):
+        """Re-split the current amount using the stored weights (after the amount changed).
+
+        Exact amounts are scaled proportionally, since they can no longer add up.
+        """
+        shares = list(self.shares.order_by('id'))
+        if not shares:
+            return
+        weights = [share.weight for share in shares]
+        exponent = minor_exponent(self.bill.currency)
+        parts = allocate(to_minor(self.amount, exponent), weights)
+        if self.split_method == EXACT and self.currency:
+            paid_exponent = minor_exponent(self.currency)
+            exact = [
+                from_minor(units, paid_exponent)
+                for units in allocate(to_minor(self.original_amount, paid_exponent), weights)
+            ]
+        for index, (share, units) in enumerate(zip(shares, parts)):
+            share.amount = from_minor(units, exponent)
+            if self.split_method == EXACT:
+                share.weight = exact[index] if self.currency else share.amount
+        ExpenseShare.objects.bulk_update(shares, ['amount', 'weight'])
+        ledger_changed(self.bill_id)
+
+
+class ExpenseShare(models.Model):
+    """One person's part of an expense"""
+    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='shares')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_shares')
+    # Relative share, percent or exact amount (in the currency paid) depending on Expense.split_method
+    weight = models.DecimalField(max_digits=10, decimal_places=2, default=1)
+    # What this person owes, precomputed so balances are plain SUMs
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['expense', 'user']
+
+    def __str__(self):
+        return f"{self.user.username} owes ${self.amount} of {self.expense.description}"
+
 
 class Settlement(models.Model):
     """Track actual settlements/payments between users"""
@@ -133,11 +525,42 @@ class Settlement(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The pending-settlements inbox: WHERE to_user = ? AND is_confirmed = false
+            models.Index(fields=['to_user', 'is_confirmed'], name='settlement_inbox_idx'),
+        ]
 
     def __str__(self):
         status = "✓" if self.is_confirmed else "⏳"
         return f"{status} {self.from_user.username} → {self.to_user.username}: ${self.amount}"
 
+    @classmethod
+    def resolve_batch(cls, user, action, ids):
+        """Confirm or reject many of the user's pending received settlements in one transaction.
+
+        Returns (processed ids, skipped ids, ids of bills that became settled); ids that
+        aren't pending settlements to the user are skipped.
+        """
+        with transaction.atomic():
+            pending = cls.objects.filter(id__in=ids, to_user=user, is_confirmed=False)
+            rows = dict(pending.values_list('id', 'bill_id'))
+            bill_ids = set(rows.values())
+            already_settled = set(Bill.objects.filter(id__in=bill_ids, is_settled=True).values_list('id', flat=True))
+            if action == 'confirm':
+                pending.filter(id__in=rows).update(is_confirmed=True, confirmed_at=timezone.now())
+                # update() skips the post_save receivers; a queryset delete() still sends
+                # post_delete for each settlement, so rejections are already handled
+                for bill_id in bill_ids:
+                    ledger_changed(bill_id)
+            else:
+                pending.filter(id__in=rows).delete()
+
+        # The settlement checks ran when the transaction committed
+        settled_bills = sorted(
+            set(Bill.objects.filter(id__in=bill_ids, is_settled=True).values_list('id', flat=True)) - already_settled
+        )
+        return sorted(rows), [settlement_id for settlement_id in ids if settlement_id not in rows], settled_bills
+
 
 class BillParticipant(models.Model):
     """Track who is involved in a bill"""
@@ -149,4 +572,168 @@ class BillParticipant(models.Model):
         unique_together = ['bill', 'user']
 
     def __str__(self):
-        return f"{self.user.username} - {self.bill.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.bill.title}"
+
+
+class SettledBalance(models.Model):
+    """A user's balance frozen at the moment the bill was settled"""
+    bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='final_balances')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='settled_balances')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        unique_together = ['bill', 'user']
+
+
+class SplitSnapshot(models.Model):
+    """get_split_calculation() of a bill at one revision, stored compactly and never updated"""
+    bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='split_snapshots')
+    revision = models.PositiveIntegerField()
+    # {'b': [[user id, balance, projected balance], ...], 's': [[from id, to id, amount], ...]}
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['bill', 'revision']
+
+    def __str__(self):
+        return f"{self.bill_id} @ {self.revision}"
+
+    @staticmethod
+    def pack(split):
+        if not split:
+            return {}
+        return {
+            'b': [
+                [person.id, str(balance), str(split['projected_balances'][person])]
+                for person, balance in split['balances'].items()
+            ],
+            's': [
+                [row['from_user'].id, row['to_user'].id, str(row['amount'])]
+                for row in split['settlements']
+            ],
+        }
+
+    @staticmethod
+    def unpack(data, total_amount):
+        """Rebuild the get_split_calculation() dict, taking the users from the request's identity map"""
+        if not data:
+            return {}
+        users = get_user_loader().load_many(row[0] for row in data['b'])
+        balances = {}
+        projected_balances = {}
+        for user_id, balance, projected in data['b']:
+            if user_id in users:
+                balances[users[user_id]] = Decimal(balance)
+                projected_balances[users[user_id]] = Decimal(projected)
+        return {
+            'balances': balances,
+            'projected_balances': projected_balances,
+            'settlements': [
+                {'from_user': users[from_id], 'to_user': users[to_id], 'amount': Decimal(amount)}
+                for from_id, to_id, amount in data['s']
+                if from_id in users and to_id in users
+            ],
+            'total_amount': total_amount,
+        }
+
+
+class Receipt(models.Model):
+    """A stored receipt file and how many expenses point at it"""
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} expenses)"
+
+    @classmethod
+    def acquire(cls, name):
+        """Count one more expense using the file, with a database-side increment"""
+        if cls.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, ref_count=1)
+        except IntegrityError:
+            # Another request registered the same file first
+            cls.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+    @classmethod
+    def release(cls, name):
+        """Count one expense fewer; the file is queued for deletion once nothing uses it"""
+        cls.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        if cls.objects.filter(name=name, ref_count=0).exists():
+            enqueue('bills.delete_orphan_receipt', {'name': name})
+
+
+class ExchangeRate(models.Model):
+    """Daily rate: units of ``currency`` per one FX_RATE_BASE_CURRENCY (see bills.currency)"""
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        unique_together = ['currency', 'date']
+        ordering = ['currency', '-date']
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} on {self.date}"
+
+
+def summary_cache_key(user_id):
+    return f"bills:summary:{user_id}"
+
+
+def invalidate_summaries(bill_id):
+    """Drop cached summaries for everyone who can see the bill, once the change commits"""
+    def invalidate():
+        bill = Bill.objects.filter(pk=bill_id).values('event_id', 'event__creator_id').first()
+        if bill is None:
+            return
+        user_ids = {bill['event__creator_id']}
+        user_ids.update(EventParticipant.objects.filter(event_id=bill['event_id']).values_list('user_id', flat=True))
+        user_ids.update(BillParticipant.objects.filter(bill_id=bill_id).values_list('user_id', flat=True))
+        cache.delete_many([summary_cache_key(user_id) for user_id in user_ids])
+
+    transaction.on_commit(invalidate)
+
+
+def ledger_changed(bill_id):
+    """An expense, share or settlement of the bill changed: start a new revision, drop cached
+    summaries and re-check settlement"""
+    Bill.bump_revision(bill_id)
+    invalidate_summaries(bill_id)
+    transaction.on_commit(lambda: Bill.check_settled(bill_id))
+
+
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Settlement)
+def expense_or_settlement_changed(sender, instance, **kwargs):
+    ledger_changed(instance.bill_id)
+
+
+@receiver([post_save, post_delete], sender=Bill)
+@receiver([post_save, post_delete], sender=BillParticipant)
+def bill_changed(sender, instance, **kwargs):
+    invalidate_summaries(instance.pk if sender is Bill else instance.bill_id)
+
+
+@receiver([post_save, post_delete], sender=EventParticipant)
+def event_participant_changed(sender, instance, **kwargs):
+    # Bill.objects.involving() goes through event participation, so joining or leaving an
+    # event changes which bills are in the user's summary
+    user_id = instance.user_id
+    transaction.on_commit(lambda: cache.delete(summary_cache_key(user_id)))
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, **kwargs):
+    # Also runs for expenses removed by a bill's cascade delete
+    if instance.receipt_image:
+        Receipt.release(instance.receipt_image.name)
+
+
+@receiver([post_save, post_delete], sender=ExchangeRate)
+def exchange_rate_changed(sender, instance, **kwargs):
+    clear_rate_cache()
@@ -0,0 +1,70 @@
+# Path: bills/receipts.py
+
+import hashlib
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from accounts.images import VARIANT_FORMATS, render_image
+
+RECEIPT_DIR = 'receipts'
+THUMBNAIL_DIR = 'receipts/thumbs'
+
+# name -> (max width, max height, crop to exact size)
+THUMBNAIL_SIZES = {
+    'thumb': (160, 160, True),
+    'list': (480, 480, False),
+    'full': (1600, 1600, False),
+}
+
+
+def receipt_digest(name):
+    """Content hash encoded in a stored receipt's name (legacy uploads use their file name)"""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def store_receipt(uploaded_file):
+    """Save an upload under its SHA-256, reusing the stored copy if the same file was uploaded before.
+
+    The upload is hashed in chunks so large photos aren't read into memory twice.
+    Returns the storage name.
+    """
+    sha = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha.update(chunk)
+    digest = sha.hexdigest()
+    extension = os.path.splitext(uploaded_file.name)[1].lower() or '.jpg'
+    name = f"{RECEIPT_DIR}/{digest[:2]}/{digest}{extension}"
+    if not default_storage.exists(name):
+        uploaded_file.seek(0)
+        name = default_storage.save(name, uploaded_file)
+    return name
+
+
+def thumbnail_name(name, size, fmt):
+    extension = VARIANT_FORMATS[fmt][1]
+    digest = receipt_digest(name)
+    return f"{THUMBNAIL_DIR}/{digest[:2]}/{digest}-{size}.{extension}"
+
+
+def get_thumbnail(name, size, fmt='jpeg'):
+    """Storage name of a resized copy of a receipt, generated on first request and then served from disk.
+
+    Thumbnails are keyed by the receipt's content hash, so expenses sharing a receipt share them too.
+    """
+    path = thumbnail_name(name, size, fmt)
+    if not default_storage.exists(path):
+        width, height, crop = THUMBNAIL_SIZES[size]
+        content, _ = render_image(default_storage.open(name), width, height, crop, fmt)
+        if not default_storage.exists(path):
+            path = default_storage.save(path, ContentFile(content))
+    return path
+
+
+def delete_receipt_files(name):
+    """Remove a stored receipt and every thumbnail generated from it"""
+    for size in THUMBNAIL_SIZES:
+        for fmt in VARIANT_FORMATS:
+            default_storage.delete(thumbnail_name(name, size, fmt))
+    default_storage.delete(name)
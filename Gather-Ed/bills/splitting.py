@@ -0,0 +1,97 @@
+# Path: bills/splitting.py
+
+from decimal import Decimal, ROUND_HALF_UP
+
+EQUAL = 'equal'
+WEIGHTED = 'weighted'
+PERCENTAGE = 'percentage'
+EXACT = 'exact'
+
+SPLIT_METHODS = [
+    (EQUAL, 'Split equally'),
+    (WEIGHTED, 'By shares (e.g. 2 for a couple)'),
+    (PERCENTAGE, 'By percentage'),
+    (EXACT, 'Exact amounts'),
+]
+
+CENT = Decimal('0.01')
+
+
+class SplitError(ValueError):
+    pass
+
+
+def to_minor(amount, exponent=2):
+    """Amount as an integer number of minor units (cents, or whole yen with exponent 0)"""
+    return int(Decimal(str(amount)).scaleb(exponent).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_minor(units, exponent=2):
+    # Amounts are stored with two decimal places whatever the currency
+    return Decimal(units).scaleb(-exponent).quantize(CENT)
+
+
+def allocate(total_units, weights):
+    """Split an integer number of minor units proportionally to weights, exactly.
+
+    Every participant gets floor(total * weight / sum); the units lost to rounding go
+    to the largest fractional remainders (earliest participant wins ties), so the
+    parts always add up to the total. Everything is integer arithmetic in one pass
+    over the weights plus a sort of the remainders.
+    """
+    # Scale weights to integers so the arithmetic is exact
+    scaled = [to_minor(weight) for weight in weights]
+    weight_sum = sum(scaled)
+    if weight_sum <= 0:
+        raise SplitError("At least one participant needs a positive share.")
+
+    parts = []
+    remainders = []
+    for index, weight in enumerate(scaled):
+        part, remainder = divmod(total_units * weight, weight_sum)
+        parts.append(part)
+        remainders.append((-remainder, index))
+
+    for _, index in sorted(remainders)[:total_units - sum(parts)]:
+        parts[index] += 1
+    return parts
+
+
+def split_minor(total_units, method, weights, exponent=2):
+    """Validate a split and return each participant's part in minor units.
+
+    ``weights`` are per-participant values whose meaning depends on ``method``:
+    ignored for EQUAL, relative shares for WEIGHTED, percents for PERCENTAGE and
+    amounts for EXACT.
+    """
+    if not weights:
+        raise SplitError("Select at least one person to share this expense.")
+    weights = [Decimal(str(weight if weight is not None else 0)) for weight in weights]
+    if any(weight < 0 for weight in weights):
+        raise SplitError("Shares can't be negative.")
+
+    if method == EQUAL:
+        weights = [Decimal(1)] * len(weights)
+    elif method == PERCENTAGE:
+        if sum(weights) != 100:
+            raise SplitError(f"Percentages must add up to 100 (got {sum(weights)}).")
+    elif method == EXACT:
+        exact = [to_minor(weight, exponent) for weight in weights]
+        if sum(exact) != total_units:
+            raise SplitError(
+                f"Exact amounts must add up to {from_minor(total_units, exponent)} "
+                f"(got {from_minor(sum(exact), exponent)})."
+            )
+        return exact
+    elif method != WEIGHTED:
+        raise SplitError(f"Unknown split method '{method}'.")
+
+    return allocate(total_units, weights)
+
+
+def split_amount(amount, method, weights, exponent=2):
+    """split_minor() for a Decimal amount, returning Decimal parts"""
+    return [
+        from_minor(units, exponent)
+        for units in split_minor(to_minor(amount, exponent), method, weights, exponent)
+    ]
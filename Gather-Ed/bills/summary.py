@@ -0,0 +1,220 @@
+# Path: bills/summary.py
+
+import csv
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery, Sum
+
+from .currency import DEFAULT_CURRENCY, RateNotFound, convert
+from .models import Bill, Expense, ExpenseShare, Settlement, ZERO, summary_cache_key
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60
+
+
+def _in_default_currency(amount, currency, missing):
+    """Convert at today's rate for cross-bill totals; currencies without a rate are noted in ``missing``"""
+    try:
+        return convert(amount, currency, DEFAULT_CURRENCY)
+    except RateNotFound:
+        missing.add(currency)
+        return None
+
+
+def _counterparties(user, bill_ids, missing):
+    """Net amount each other person owes the user (negative = user owes them) on unsettled bills,
+    in DEFAULT_CURRENCY"""
+    net = {}
+
+    def add(user_id, username, currency, amount):
+        amount = _in_default_currency(amount, currency, missing)
+        if amount is not None:
+            entry = net.setdefault(user_id, [username, ZERO])
+            entry[1] += amount
+
+    # Shares other people owe on expenses the user paid
+    owed_to_user = ExpenseShare.objects.filter(
+        expense__bill_id__in=bill_ids, expense__paid_by=user
+    ).exclude(user=user).order_by().values('user_id', 'user__username', 'expense__bill__currency').annotate(
+        total=Sum('amount')
+    )
+    for row in owed_to_user:
+        add(row['user_id'], row['user__username'], row['expense__bill__currency'], row['total'])
+
+    # The user's shares of expenses other people paid
+    user_owes = ExpenseShare.objects.filter(
+        expense__bill_id__in=bill_ids, user=user
+    ).exclude(expense__paid_by=user).order_by().values(
+        'expense__paid_by_id', 'expense__paid_by__username', 'expense__bill__currency'
+    ).annotate(total=Sum('amount'))
+    for row in user_owes:
+        add(row['expense__paid_by_id'], row['expense__paid_by__username'], row['expense__bill__currency'], -row['total'])
+
+    # Confirmed payments between the user and each counterparty
+    confirmed = Settlement.objects.filter(bill_id__in=bill_ids, is_confirmed=True).order_by()
+    sent = confirmed.filter(from_user=user).values('to_user_id', 'to_user__username', 'bill__currency').annotate(
+        total=Sum('amount')
+    )
+    for row in sent:
+        add(row['to_user_id'], row['to_user__username'], row['bill__currency'], row['total'])
+    received = confirmed.filter(to_user=user).values('from_user_id', 'from_user__username', 'bill__currency').annotate(
+        total=Sum('amount')
+    )
+    for row in received:
+        add(row['from_user_id'], row['from_user__username'], row['bill__currency'], -row['total'])
+
+    return sorted(
+        (
+            {'user_id': user_id, 'username': username, 'balance': round(balance, 2)}
+            for user_id, (username, balance) in net.items()
+            if round(balance, 2)
+        ),
+        key=lambda row: row['balance'],
+    )
+
+
+def build_summary(user):
+    """Compute the user's cross-bill summary.
+
+    One annotated query yields every bill with the user's balance; totals, counts and the
+    per-event breakdown are folded from that single pass. Counterparty balances take
+    grouped queries over expense shares and confirmed settlements. Per-bill figures stay
+    in the bill's currency; everything summed across bills is in DEFAULT_CURRENCY.
+    """
+    rows = Bill.objects.involving(user).with_summary(user).order_by('-created_at').values(
+        'id', 'title', 'is_settled', 'total_amount', 'currency', 'event_id', 'event__title', 'user_balance'
+    )
+
+    summary = {
+        'total_bills': 0,
+        'settled_bills': 0,
+        'unsettled_bills': 0,
+        'total_owed_to_user': ZERO,
+        'total_user_owes': ZERO,
+        'bills_breakdown': [],
+        'events_breakdown': [],
+        'counterparties': [],
+        'currency': DEFAULT_CURRENCY,
+        'missing_rates': [],
+    }
+    events = OrderedDict()
+    unsettled_ids = []
+    missing = set()
+
+    for row in rows:
+        balance = Decimal(row['user_balance'] or 0).quantize(Decimal('0.01'))
+        summary['total_bills'] += 1
+        summary['bills_breakdown'].append({
+            'bill': {
+                'id': row['id'],
+                'title': row['title'],
+                'is_settled': row['is_settled'],
+                'event': {'id': row['event_id'], 'title': row['event__title']},
+            },
+            'balance': balance,
+            'total_amount': row['total_amount'],
+            'currency': row['currency'],
+        })
+
+        if row['is_settled']:
+            summary['settled_bills'] += 1
+            continue
+
+        # Only unsettled bills count towards what is still owed
+        summary['unsettled_bills'] += 1
+        unsettled_ids.append(row['id'])
+        balance = _in_default_currency(balance, row['currency'], missing)
+        if balance is None:
+            continue
+        if balance > 0:
+            summary['total_owed_to_user'] += balance
+        elif balance < 0:
+            summary['total_user_owes'] += abs(balance)
+
+        event = events.setdefault(row['event_id'], {
+            'event': {'id': row['event_id'], 'title': row['event__title']},
+            'bill_count': 0,
+            'balance': ZERO,
+        })
+        event['bill_count'] += 1
+        event['balance'] += balance
+
+    summary['events_breakdown'] = [event for event in events.values() if event['balance']]
+    if unsettled_ids:
+        summary['counterparties'] = _counterparties(user, unsettled_ids, missing)
+    summary['missing_rates'] = sorted(missing)
+    return summary
+
+
+def get_summary(user):
+    """Cached summary; the entry is dropped whenever an expense, settlement or bill of the user changes"""
+    key = summary_cache_key(user.id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary(user)
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+EXPORT_FIELDS = [
+    'date', 'event', 'bill', 'bill_settled', 'description', 'amount', 'currency', 'paid_by', 'shared_by_count',
+    'your_share',
+]
+
+
+def export_rows(user, chunk_size=2000):
+    """Yield one dict per expense on the user's bills, streamed from the database in chunks"""
+    your_share = ExpenseShare.objects.filter(expense=OuterRef('pk'), user=user).values('amount')[:1]
+    shared_by_count = ExpenseShare.objects.filter(expense=OuterRef('pk')).order_by().values('expense').annotate(
+        c=Count('id')
+    ).values('c')
+
+    expenses = Expense.objects.filter(
+        bill__in=Bill.objects.involving(user).values('id')
+    ).annotate(
+        your_share=Subquery(your_share),
+        shared_by_count=Subquery(shared_by_count),
+    ).order_by('created_at', 'id').values_list(
+        'created_at', 'bill__event__title', 'bill__title', 'bill__is_settled', 'description',
+        'amount', 'bill__currency', 'paid_by__username', 'shared_by_count', 'your_share',
+    )
+
+    for row in expenses.iterator(chunk_size=chunk_size):
+        created_at, event, bill, settled, description, amount, currency, paid_by, count, share = row
+        yield {
+            'date': created_at.isoformat(),
+            'event': event,
+            'bill': bill,
+            'bill_settled': settled,
+            'description': description,
+            'amount': str(amount),
+            'currency': currency,
+            'paid_by': paid_by,
+            'shared_by_count': count or 0,
+            'your_share': str(share) if share is not None else '0.00',
+        }
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each line back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(user):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_rows(user):
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def stream_json(user):
+    yield '['
+    first = True
+    for row in export_rows(user):
+        yield ('' if first else ',') + '\n' + json.dumps(row)
+        first = False
+    yield '\n]\n'
@@ -0,0 +1,14 @@
+# Path: bills/tasks.py
+
+from jobs.queue import task
+from .models import Expense, Receipt
+from .receipts import delete_receipt_files
+
+
+@task
+def delete_orphan_receipt(name):
+    """Delete a receipt file (and its thumbnails) that no expense uses any more"""
+    deleted, _ = Receipt.objects.filter(name=name, ref_count=0).delete()
+    # The count may have drifted; never remove a file an expense still points at
+    if deleted and not Expense.objects.filter(receipt_image=name).exists():
+        delete_receipt_files(name)
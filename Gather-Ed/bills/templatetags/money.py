@@ -0,0 +1,18 @@
+from django import template
+
+from bills.currency import minor_exponent, symbol
+
+register = template.Library()
+
+@register.filter
+def money(value, currency):
+    """Format an amount in a currency, e.g. {{ bill.total_amount|money:bill.currency }} -> $12.50 or 1,200 JPY."""
+    if value is None or value == '':
+        return ''
+    places = minor_exponent(currency)
+    amount = f"{abs(value):,.{places}f}"
+    sign = '-' if value < 0 else ''
+    prefix = symbol(currency)
+    if prefix:
+        return f"{sign}{prefix}{amount}"
+    return f"{sign}{amount} {currency}"
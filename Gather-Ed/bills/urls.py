@@ -8,11 +8,16 @@ urlpatterns = [
     path('create/', views.create_bill, name='create_bill'),
     path('<int:bill_id>/', views.bill_detail, name='bill_detail'),
     path('<int:bill_id>/expenses/add/', views.add_expense, name='add_expense'),
+    path('<int:bill_id>/expenses/import/', views.import_expenses, name='import_expenses'),
     path('expenses/<int:expense_id>/edit/', views.edit_expense, name='edit_expense'),
     path('expenses/<int:expense_id>/delete/', views.delete_expense, name='delete_expense'),
+    path('expenses/<int:expense_id>/receipt/<str:size>/', views.receipt_thumbnail, name='receipt_thumbnail'),
     path('<int:bill_id>/settlements/record/', views.record_settlement, name='record_settlement'),
     path('settlements/<int:settlement_id>/confirm/', views.confirm_settlement, name='confirm_settlement'),
     path('settlements/<int:settlement_id>/reject/', views.reject_settlement, name='reject_settlement'),
+    path('settlements/pending/', views.settlement_inbox, name='settlement_inbox'),
+    path('settlements/batch/', views.batch_settlements, name='batch_settlements'),
     path('<int:bill_id>/toggle-settlement/', views.toggle_bill_settlement, name='toggle_bill_settlement'),
     path('summary/', views.user_summary, name='user_summary'),
+    path('summary/export/<str:fmt>/', views.export_summary, name='export_summary'),
 ]
\ No newline at end of file
@@ -3,23 +3,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Prefetch, Sum
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.http import require_POST
+from accounts.conditional import conditional_page
+from accounts.fragments import fragment_version, version_timestamp
+from accounts.loaders import get_user_loader
 from eventpollapp.models import Event
-from .models import Bill, Expense, Settlement, BillParticipant
-from .forms import BillForm, ExpenseForm, SettlementForm, BillFilterForm
-from datetime import datetime
+from notifications.delivery import notify_settlement
+from .models import Bill, Expense, ExpenseShare, Settlement, BillParticipant
+from .forms import BillForm, ExpenseForm, SettlementForm, BillFilterForm, ExpenseImportForm
+from . import importers
+from .receipts import THUMBNAIL_SIZES, get_thumbnail
+from .summary import get_summary, stream_csv, stream_json
+import io
+import json
+
+BILLS_PER_PAGE = 24
+MAX_BATCH_SETTLEMENTS = 500
 
 @login_required
 def bill_list(request):
     """List all bills for user's events"""
     filter_form = BillFilterForm(request.user, request.GET)
     
-    # Get bills for events where user is involved
-    bills = Bill.objects.filter(
-        Q(event__creator=request.user) | Q(event__participants__user=request.user)
-    ).distinct().select_related('event', 'created_by')
+    # Get bills for events where user is involved, with per-bill summary computed in the same query
+    bills = Bill.objects.visible_to(request.user).select_related('event', 'created_by')
     
     # Apply filters
     if filter_form.is_valid():
@@ -34,13 +48,17 @@ def bill_list(request):
         elif settlement_status == 'unsettled':
             bills = bills.filter(is_settled=False)
     
-    # Calculate summary for each bill
-    for bill in bills:
-        bill.expense_count = bill.expenses.count()
-        bill.user_balance = bill.get_split_calculation().get('balances', {}).get(request.user, 0)
+    bills = bills.with_summary(request.user)
+    page_obj = Paginator(bills, BILLS_PER_PAGE).get_page(request.GET.get('page'))
+    
+    # Keep the active filters on pagination links
+    query_params = request.GET.copy()
+    query_params.pop('page', None)
     
     context = {
-        'bills': bills,
+        'bills': page_obj,
+        'page_obj': page_obj,
+        'filter_query': query_params.urlencode(),
         'filter_form': filter_form,
     }
     return render(request, 'bills/bill_list.html', context)
@@ -63,10 +81,23 @@ def create_bill(request):
     
     return render(request, 'bills/create_bill.html', {'form': form})
 
+def bill_fingerprint(request, bill_id):
+    bill = Bill.objects.filter(pk=bill_id).values('revision', 'updated_at', 'event_id').first()
+    if bill is None:
+        return None
+    # The expense and settlement forms list the event's participants
+    participants = fragment_version(Event, bill['event_id'], 'participants')
+    last_modified = max(bill['updated_at'], version_timestamp(participants))
+    return [bill['revision'], bill['updated_at'].isoformat(), participants], last_modified
+
 @login_required
+@conditional_page(bill_fingerprint)
 def bill_detail(request, bill_id):
     """View bill details with expenses and split calculation"""
-    bill = get_object_or_404(Bill, id=bill_id)
+    bill = get_object_or_404(Bill.objects.select_related('event'), id=bill_id)
+    # Every user on the page comes from one identity map, so each is loaded once
+    users = get_user_loader()
+    users.attach([bill, bill.event], 'created_by', 'creator')
     
     # Check if user can access this bill
     can_access = (
@@ -83,25 +114,39 @@ def bill_detail(request, bill_id):
     BillParticipant.objects.get_or_create(bill=bill, user=request.user)
     
     # Get split calculation
-    split_data = bill.get_split_calculation()
+    split_data = bill.split_data()
     
     # Forms
     expense_form = ExpenseForm(bill)
     settlement_form = SettlementForm(bill, request.user)
     
     # Get user's settlements for this bill
-    user_settlements = Settlement.objects.filter(
+    user_settlements = list(Settlement.objects.filter(
         bill=bill,
         from_user=request.user
-    ).select_related('to_user')
+    ))
     
-    received_settlements = Settlement.objects.filter(
+    received_settlements = list(Settlement.objects.filter(
         bill=bill,
         to_user=request.user
-    ).select_related('from_user')
+    ))
+    
+    users.attach([*user_settlements, *received_settlements], 'to_user', 'from_user')
+    
+    def load_expenses():
+        expenses = list(bill.expenses.prefetch_related(
+            Prefetch('shares', queryset=ExpenseShare.objects.order_by('user__username'))
+        ))
+        shares = [share for expense in expenses for share in expense.shares.all()]
+        users.attach([*expenses, *shares], 'paid_by', 'user')
+        return expenses
+    
+    # Only loaded when the template's cached expense list is stale
+    expenses = SimpleLazyObject(load_expenses)
     
     context = {
         'bill': bill,
+        'expenses': expenses,
         'split_data': split_data,
         'expense_form': expense_form,
         'settlement_form': settlement_form,
@@ -131,13 +176,12 @@ def add_expense(request, bill_id):
     if request.method == 'POST':
         form = ExpenseForm(bill, request.POST, request.FILES)
         if form.is_valid():
-            expense = form.save(commit=False)
-            expense.bill = bill
-            expense.save()
-            form.save_m2m()  # Save many-to-many relationships
-            
-            # Recalculate bill total
-            bill.calculate_total()
+            # Expense.save() adjusts the bill total in the same transaction
+            with transaction.atomic():
+                expense = form.save(commit=False)
+                expense.bill = bill
+                expense.save()
+                form.save_m2m()  # Save many-to-many relationships
             
             messages.success(request, 'Expense added successfully!')
             return redirect('bills:bill_detail', bill_id=bill_id)
@@ -148,6 +192,42 @@ def add_expense(request, bill_id):
     
     return render(request, 'bills/add_expense.html', {'form': form, 'bill': bill})
 
+@login_required
+def import_expenses(request, bill_id):
+    """Bulk-import expenses from a CSV or bank statement file"""
+    bill = get_object_or_404(Bill, id=bill_id)
+    
+    # Check access
+    can_access = (
+        bill.event.creator == request.user or
+        bill.event.participants.filter(user=request.user).exists() or
+        bill.created_by == request.user
+    )
+    
+    if not can_access:
+        messages.error(request, "You don't have permission to add expenses to this bill.")
+        return redirect('bills:bill_detail', bill_id=bill_id)
+    
+    result = None
+    if request.method == 'POST':
+        form = ExpenseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            reader = importers.READERS[form.cleaned_data['file_format']]
+            text_file = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', errors='replace')
+            result = importers.import_expenses(bill, reader(text_file), request.user)
+            
+            if result.created and not result.error_count:
+                messages.success(request, f'Imported {result.created} expenses.')
+                return redirect('bills:bill_detail', bill_id=bill_id)
+            if result.created:
+                messages.warning(request, f'Imported {result.created} expenses; {result.error_count} rows had errors.')
+            else:
+                messages.error(request, 'No expenses were imported.')
+    else:
+        form = ExpenseImportForm()
+    
+    return render(request, 'bills/import_expenses.html', {'form': form, 'bill': bill, 'result': result})
+
 @login_required
 def edit_expense(request, expense_id):
     """Edit an existing expense"""
@@ -168,10 +248,8 @@ def edit_expense(request, expense_id):
     if request.method == 'POST':
         form = ExpenseForm(bill, request.POST, request.FILES, instance=expense)
         if form.is_valid():
-            form.save()
-            
-            # Recalculate bill total
-            bill.calculate_total()
+            with transaction.atomic():
+                expense = form.save()
             
             messages.success(request, 'Expense updated successfully!')
             return redirect('bills:bill_detail', bill_id=bill.id)
@@ -198,14 +276,36 @@ def delete_expense(request, expense_id):
         messages.error(request, "You don't have permission to delete this expense.")
         return redirect('bills:bill_detail', bill_id=bill.id)
     
+    # Also subtracts the amount from the bill total
     expense.delete()
     
-    # Recalculate bill total
-    bill.calculate_total()
-    
     messages.success(request, 'Expense deleted successfully!')
     return redirect('bills:bill_detail', bill_id=bill.id)
 
+@login_required
+def receipt_thumbnail(request, expense_id, size):
+    """Redirect to a resized receipt image, generating it on first request"""
+    expense = get_object_or_404(Expense.objects.select_related('bill__event'), id=expense_id)
+    bill = expense.bill
+    
+    can_access = (
+        bill.event.creator == request.user or
+        bill.event.participants.filter(user=request.user).exists() or
+        bill.created_by == request.user
+    )
+    if not can_access or not expense.receipt_image or size not in THUMBNAIL_SIZES:
+        raise Http404
+    
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    try:
+        name = get_thumbnail(expense.receipt_image.name, size, fmt)
+    except (OSError, ValueError):
+        # Missing or unreadable original; fall back to whatever is stored
+        return redirect(expense.receipt_image.url)
+    response = redirect(default_storage.url(name))
+    response['Vary'] = 'Accept'
+    return response
+
 @login_required
 def record_settlement(request, bill_id):
     """Record a settlement payment"""
@@ -218,6 +318,7 @@ def record_settlement(request, bill_id):
             settlement.bill = bill
             settlement.from_user = request.user
             settlement.save()
+            notify_settlement(settlement)
             
             messages.success(request, f'Settlement of ${settlement.amount} recorded. Waiting for confirmation from {settlement.to_user.username}.')
             return redirect('bills:bill_detail', bill_id=bill_id)
@@ -232,10 +333,14 @@ def confirm_settlement(request, settlement_id):
     
     if not settlement.is_confirmed:
         settlement.is_confirmed = True
-        settlement.confirmed_at = datetime.now()
+        settlement.confirmed_at = timezone.now()
         settlement.save()
         
         messages.success(request, f'Settlement from {settlement.from_user.username} confirmed!')
+        # Saving the settlement re-checks the bill's balances
+        bill = Bill.objects.get(pk=settlement.bill_id)
+        if bill.is_settled:
+            messages.success(request, f'All balances on "{bill.title}" are paid off, so it is now settled.')
     else:
         messages.warning(request, 'Settlement was already confirmed.')
     
@@ -255,6 +360,49 @@ def reject_settlement(request, settlement_id):
     
     return redirect('bills:bill_detail', bill_id=settlement.bill.id)
 
+@login_required
+def settlement_inbox(request):
+    """All settlements waiting for the user's confirmation, across bills"""
+    pending = Settlement.objects.filter(to_user=request.user, is_confirmed=False).select_related(
+        'from_user', 'bill', 'bill__event'
+    )
+    return render(request, 'bills/settlement_inbox.html', {'pending': pending})
+
+@login_required
+@require_POST
+def batch_settlements(request):
+    """Confirm or reject many received settlements in one transaction.
+
+    Accepts JSON ({"action": "confirm", "ids": [1, 2]}) or form data and answers with JSON.
+    Ids that aren't pending settlements to the user are reported as skipped.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+            action, ids = data.get('action'), data.get('ids', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    else:
+        action, ids = request.POST.get('action'), request.POST.getlist('ids')
+    
+    if action not in ('confirm', 'reject'):
+        return JsonResponse({'error': "action must be 'confirm' or 'reject'"}, status=400)
+    try:
+        ids = sorted({int(settlement_id) for settlement_id in ids})
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'ids must be integers'}, status=400)
+    if len(ids) > MAX_BATCH_SETTLEMENTS:
+        return JsonResponse({'error': f'At most {MAX_BATCH_SETTLEMENTS} settlements per request'}, status=400)
+    
+    processed, skipped, settled_bills = Settlement.resolve_batch(request.user, action, ids)
+    
+    return JsonResponse({
+        'action': action,
+        'processed': processed,
+        'skipped': skipped,
+        'settled_bills': settled_bills,
+    })
+
 @login_required
 @require_POST
 def toggle_bill_settlement(request, bill_id):
@@ -265,8 +413,11 @@ def toggle_bill_settlement(request, bill_id):
     if bill.created_by != request.user:
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
-    bill.is_settled = not bill.is_settled
-    bill.save()
+    # Settling freezes the current balances; unsettling drops them
+    if bill.is_settled:
+        bill.reopen()
+    else:
+        bill.mark_settled()
     
     status_text = "settled" if bill.is_settled else "unsettled"
     messages.success(request, f'Bill marked as {status_text}!')
@@ -276,41 +427,19 @@ def toggle_bill_settlement(request, bill_id):
 @login_required
 def user_summary(request):
     """Show user's overall financial summary across all bills"""
-    # Get all bills user is involved in
-    user_bills = Bill.objects.filter(
-        Q(event__creator=request.user) | 
-        Q(event__participants__user=request.user) |
-        Q(participants__user=request.user)
-    ).distinct()
-
-    summary_data = {
-        'total_bills': user_bills.count(),
-        'settled_bills': user_bills.filter(is_settled=True).count(),
-        'unsettled_bills': user_bills.filter(is_settled=False).count(),
-        'total_owed_to_user': 0,
-        'total_user_owes': 0,
-        'bills_breakdown': [],
-    }
-
-    for bill in user_bills:
-        split_data = bill.get_split_calculation()
-        user_balance = split_data.get('balances', {}).get(request.user, 0)
-
-        bill_info = {
-            'bill': bill,
-            'balance': user_balance,
-            'total_amount': bill.total_amount,
-        }
-        summary_data['bills_breakdown'].append(bill_info)
-
-        # ✅ Only count unsettled bills in totals
-        if not bill.is_settled:
-            if user_balance > 0:
-                summary_data['total_owed_to_user'] += user_balance
-            elif user_balance < 0:
-                summary_data['total_user_owes'] += abs(user_balance)
-
     context = {
-        'summary_data': summary_data,
+        'summary_data': get_summary(request.user),
     }
-    return render(request, 'bills/user_summary.html', context)
\ No newline at end of file
+    return render(request, 'bills/user_summary.html', context)
+
+@login_required
+def export_summary(request, fmt):
+    """Stream the user's full expense history as CSV or JSON"""
+    if fmt == 'csv':
+        response = StreamingHttpResponse(stream_csv(request.user), content_type='text/csv')
+    elif fmt == 'json':
+        response = StreamingHttpResponse(stream_json(request.user), content_type='application/json')
+    else:
+        raise Http404("Unsupported export format")
+    response['Content-Disposition'] = f'attachment; filename="expenses-{request.user.username}.{fmt}"'
+    return response
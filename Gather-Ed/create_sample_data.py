@@ -280,9 +280,8 @@ def create_sample_data():
                         paid_by=users[exp_data['paid_by']]
                     )
                     
-                    # Add shared_by users
-                    for username in exp_data['shared_by']:
-                        expense.shared_by.add(users[username])
+                    # Split equally between the shared_by users
+                    expense.set_shares({users[username].id: 1 for username in exp_data['shared_by']})
                     
                     print(f"Added expense: {expense.description} - ${expense.amount}")
                 
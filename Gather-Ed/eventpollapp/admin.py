@@ -1,13 +1,13 @@
 
 from django.contrib import admin
-from .models import Event, DateOption, DateVote, EventRequirement, EventComment, EventParticipant
+from .models import ArchivedEvent, Availability, Event, DateOption, EventOccurrence, DateVote, EventRequirement, EventComment, EventParticipant
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     list_display = ['title', 'creator', 'required_role', 'is_date_finalized', 'created_at']
     list_filter = ['is_date_finalized', 'created_at', 'required_role']
     search_fields = ['title', 'description', 'creator__username']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['tiebreak_seed', 'tiebreak_record', 'recurrence_end', 'created_at', 'updated_at']
 
 @admin.register(DateOption)
 class DateOptionAdmin(admin.ModelAdmin):
@@ -45,4 +45,28 @@ class EventCommentAdmin(admin.ModelAdmin):
 class EventParticipantAdmin(admin.ModelAdmin):
     list_display = ['user', 'event', 'status', 'joined_at']
     list_filter = ['status', 'joined_at']
-    search_fields = ['user__username', 'event__title']
\ No newline at end of file
+    search_fields = ['user__username', 'event__title']
+
+@admin.register(Availability)
+class AvailabilityAdmin(admin.ModelAdmin):
+    list_display = ['user', 'event', 'start', 'end']
+    list_filter = ['start']
+    search_fields = ['user__username', 'event__title']
+
+@admin.register(EventOccurrence)
+class EventOccurrenceAdmin(admin.ModelAdmin):
+    list_display = ['event', 'original_start', 'start', 'is_cancelled']
+    list_filter = ['is_cancelled']
+    search_fields = ['event__title']
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(admin.ModelAdmin):
+    list_display = ['title', 'creator', 'finalized_date', 'archived_at']
+    list_filter = ['archived_at']
+    search_fields = ['title', 'creator__username']
+    exclude = ['data', 'members']
+    readonly_fields = ['id', 'title', 'creator', 'required_role', 'finalized_date', 'location', 'created_at', 'archived_at']
+
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,146 @@
+# Path: eventpollapp/archive.py
+
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    ArchivedEvent, DateOption, DateVote, Event, EventComment, EventOccurrence, EventParticipant, EventRequirement,
+)
+
+ARCHIVE_AFTER_DAYS = 365
+BATCH_SIZE = 200
+
+# Keys holding datetimes, turned back into datetimes when an archive is read
+DATETIME_KEYS = {'finalized_date', 'proposed_date', 'original_start', 'start', 'joined_at', 'created_at', 'updated_at'}
+
+
+def archivable(before):
+    """Finalized events that took place before ``before``, for a series its last occurrence.
+
+    Events with bills stay where they are: bills belong to the event and would go with it.
+    """
+    return Event.objects.filter(
+        Q(recurrence='') | Q(recurrence_end__lt=before),
+        is_date_finalized=True, finalized_date__lt=before, bills__isnull=True,
+    )
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts datetimes to milliseconds; keep them exact
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def pack(document):
+    return zlib.compress(json.dumps(document, cls=ArchiveEncoder, separators=(',', ':')).encode(), 9)
+
+
+def _revive(value):
+    if isinstance(value, list):
+        return [_revive(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: parse_datetime(item) if key in DATETIME_KEYS and item else _revive(item)
+            for key, item in value.items()
+        }
+    return value
+
+
+def unpack(data):
+    return _revive(json.loads(zlib.decompress(bytes(data))))
+
+
+def snapshot(event_ids):
+    """Archive documents for the given events, keyed by event id, in one query per table"""
+    documents = {
+        row['id']: dict(row, date_options=[], participants=[], requirements=[], comments=[], occurrence_overrides=[])
+        for row in Event.objects.filter(id__in=event_ids).values(
+            'id', 'title', 'description', 'location', 'creator_id', 'creator__username', 'required_role_id',
+            'finalized_date', 'duration_minutes', 'recurrence', 'tiebreak_policy', 'tiebreak_seed', 'tiebreak_record',
+            'created_at', 'updated_at',
+        )
+    }
+
+    votes = {}
+    for vote in DateVote.objects.filter(date_option__event_id__in=event_ids).order_by('id').values(
+        'date_option_id', 'user_id', 'user__username'
+    ):
+        votes.setdefault(vote.pop('date_option_id'), []).append(vote)
+    for option in DateOption.objects.filter(event_id__in=event_ids).order_by('proposed_date').values(
+        'id', 'event_id', 'proposed_date', 'proposed_by_id', 'proposed_by__username'
+    ):
+        option['votes'] = votes.get(option['id'], [])
+        documents[option.pop('event_id')]['date_options'].append(option)
+
+    sections = [
+        ('participants', EventParticipant.objects.order_by('joined_at'), [
+            'user_id', 'user__username', 'status', 'joined_at',
+        ]),
+        ('requirements', EventRequirement.objects.order_by('is_completed', 'created_at'), [
+            'requirement_type', 'title', 'description', 'added_by__username', 'assigned_to__username',
+            'is_completed', 'created_at',
+        ]),
+        ('comments', EventComment.objects.order_by('created_at'), [
+            'user_id', 'user__username', 'content', 'created_at',
+        ]),
+        ('occurrence_overrides', EventOccurrence.objects.order_by('original_start'), [
+            'original_start', 'start', 'is_cancelled', 'location', 'note',
+        ]),
+    ]
+    for section, queryset, fields in sections:
+        for row in queryset.filter(event_id__in=event_ids).values('event_id', *fields):
+            documents[row.pop('event_id')][section].append(row)
+    return documents
+
+
+def archive_events(before=None, batch_size=BATCH_SIZE):
+    """Move events that ended before ``before`` (default: a year ago) into ArchivedEvent.
+
+    Each batch is snapshotted, written to the archive and deleted from the hot tables in one
+    transaction, so an event is always in exactly one place. Availability windows are only
+    used for planning and are not kept. Returns how many events were archived.
+    """
+    before = before or timezone.now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            event_ids = list(
+                archivable(before).select_for_update(skip_locked=True, of=('self',)).filter(id__gt=last_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not event_ids:
+                break
+            last_id = event_ids[-1]
+
+            documents = snapshot(event_ids)
+            ArchivedEvent.objects.bulk_create([
+                ArchivedEvent(
+                    id=document['id'],
+                    title=document['title'],
+                    creator_id=document['creator_id'],
+                    required_role_id=document['required_role_id'],
+                    finalized_date=document['finalized_date'],
+                    location=document['location'],
+                    created_at=document['created_at'],
+                    data=pack(document),
+                )
+                for document in documents.values()
+            ])
+            ArchivedEvent.members.through.objects.bulk_create([
+                ArchivedEvent.members.through(archivedevent_id=event_id, user_id=user_id)
+                for event_id, document in documents.items()
+                for user_id in {document['creator_id'], *(p['user_id'] for p in document['participants'])}
+            ])
+            Event.objects.filter(id__in=event_ids).delete()
+            archived += len(event_ids)
+    return archived
@@ -1,9 +1,13 @@
 # Path: eventpollapp/forms.py
 
+from datetime import datetime, time, timedelta
+
 from django import forms
 from django.contrib.auth.models import User
+from django.utils import timezone
 from accounts.models import Role, UserRole
-from .models import Event, DateOption, EventRequirement, EventComment
+from .models import Availability, Event, DateOption, EventOccurrence, EventRequirement, EventComment
+from . import recurrence
 
 class EventForm(forms.ModelForm):
     date_options = forms.CharField(
@@ -14,15 +18,39 @@ class EventForm(forms.ModelForm):
         }),
         help_text="Enter date and time options, one per line (Format: YYYY-MM-DD HH:MM)"
     )
+    # Put together into the event's RRULE in clean()
+    repeat = forms.ChoiceField(
+        choices=recurrence.FREQUENCY_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    repeat_interval = forms.IntegerField(
+        min_value=1, max_value=52, initial=1, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+    )
+    repeat_days = forms.MultipleChoiceField(
+        choices=recurrence.WEEKDAY_CHOICES, required=False, widget=forms.CheckboxSelectMultiple,
+        help_text="Weekly only; defaults to the weekday of the chosen date",
+    )
+    repeat_count = forms.IntegerField(
+        min_value=1, max_value=recurrence.MAX_COUNT, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Forever'}),
+    )
+    repeat_until = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
 
     class Meta:
         model = Event
-        fields = ['title', 'description', 'required_role', 'location']
+        fields = ['title', 'description', 'required_role', 'location', 'duration_minutes', 'tiebreak_policy', 'poll_closes_at']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
+            'duration_minutes': forms.NumberInput(attrs={'class': 'form-control', 'min': 15, 'step': 15}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'location': forms.TextInput(attrs={'class': 'form-control'}),
             'required_role': forms.Select(attrs={'class': 'form-control'}),
+            'tiebreak_policy': forms.Select(attrs={'class': 'form-control'}),
+            'poll_closes_at': forms.DateTimeInput(
+                attrs={'class': 'form-control', 'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'
+            ),
         }
 
     def __init__(self, user, *args, **kwargs):
@@ -30,6 +58,15 @@ class EventForm(forms.ModelForm):
         # Only show roles created by the user
         self.fields['required_role'].queryset = Role.objects.filter(created_by=user)
         self.fields['required_role'].empty_label = "No specific role required"
+        rule = self.instance.rule
+        if rule:
+            self.initial.update({
+                'repeat': rule.freq,
+                'repeat_interval': rule.interval,
+                'repeat_days': [recurrence.WEEKDAYS[day] for day in rule.byday],
+                'repeat_count': rule.count,
+                'repeat_until': rule.until and timezone.localdate(rule.until),
+            })
 
     def clean_date_options(self):
         date_options_text = self.cleaned_data['date_options']
@@ -51,6 +88,37 @@ class EventForm(forms.ModelForm):
         
         return date_options
 
+    def clean_poll_closes_at(self):
+        closes_at = self.cleaned_data['poll_closes_at']
+        if closes_at and closes_at <= timezone.now():
+            raise forms.ValidationError('Voting must close in the future.')
+        return closes_at
+
+    def clean(self):
+        cleaned_data = super().clean()
+        freq = cleaned_data.get('repeat')
+        if not freq:
+            self.instance.recurrence = ''
+        else:
+            until = cleaned_data.get('repeat_until')
+            if until:
+                # The whole of the last day counts
+                until = timezone.make_aware(datetime.combine(until, time.max.replace(microsecond=0)))
+            try:
+                rule = recurrence.Rule(
+                    freq=freq,
+                    interval=cleaned_data.get('repeat_interval') or 1,
+                    byday=tuple(sorted(recurrence.WEEKDAYS.index(day) for day in cleaned_data.get('repeat_days', [])))
+                    if freq == recurrence.WEEKLY else (),
+                    count=cleaned_data.get('repeat_count'),
+                    until=until,
+                ).validated()
+            except ValueError as error:
+                raise forms.ValidationError(str(error))
+            self.instance.recurrence = str(rule)
+        self.instance.__dict__.pop('rule', None)
+        return cleaned_data
+
 
 class DateOptionForm(forms.ModelForm):
     class Meta:
@@ -95,6 +163,19 @@ class EventRequirementForm(forms.ModelForm):
         self.fields['assigned_to'].empty_label = "Not assigned"
 
 
+class EventOccurrenceForm(forms.ModelForm):
+    class Meta:
+        model = EventOccurrence
+        fields = ['start', 'location', 'note']
+        widgets = {
+            'start': forms.DateTimeInput(
+                attrs={'class': 'form-control form-control-sm', 'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'
+            ),
+            'location': forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Same place'}),
+            'note': forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Note'}),
+        }
+
+
 class EventCommentForm(forms.ModelForm):
     class Meta:
         model = EventComment
@@ -119,4 +200,26 @@ class EventParticipationForm(forms.Form):
     status = forms.ChoiceField(
         choices=STATUS_CHOICES,
         widget=forms.Select(attrs={'class': 'form-control'})
-    )
\ No newline at end of file
+    )
+
+
+class AvailabilityForm(forms.ModelForm):
+    MAX_WINDOW = timedelta(days=14)
+
+    class Meta:
+        model = Availability
+        fields = ['start', 'end']
+        widgets = {
+            'start': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'end': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end:
+            if end <= start:
+                raise forms.ValidationError('The end must be after the start.')
+            if end - start > self.MAX_WINDOW:
+                raise forms.ValidationError('Add windows of at most two weeks at a time.')
+        return cleaned_data
@@ -0,0 +1,157 @@
+# Path: eventpollapp/ical.py
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+
+from accounts.fragments import fragment_version
+from accounts.models import Profile
+from .models import Event
+
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+FEED_CHUNK_SIZE = 500
+PRODID = '-//Gather-ed//Events//EN'
+
+# Participation statuses whose events show up in the user's feed
+FEED_STATUSES = ['going', 'maybe', 'interested']
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces = []
+    while encoded:
+        limit = 75 if not pieces else 74
+        # Don't cut a UTF-8 sequence in half
+        while limit < len(encoded) and (encoded[limit] & 0xC0) == 0x80:
+            limit -= 1
+        pieces.append(encoded[:limit].decode())
+        encoded = encoded[limit:]
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _vevent_lines(event, url, start, location, extra):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{event.id}@gather-ed",
+        f"DTSTAMP:{_utc(event.updated_at)}",
+        f"LAST-MODIFIED:{_utc(event.updated_at)}",
+        f"DTSTART:{_utc(start)}",
+        f"DTEND:{_utc(start + timedelta(minutes=event.duration_minutes))}",
+        *extra,
+        f"SUMMARY:{_escape(event.title)}",
+        f"DESCRIPTION:{_escape(event.description)}",
+        f"URL:{url}",
+    ]
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    lines.append('END:VEVENT')
+    return lines
+
+
+def vevent(event, base_url):
+    """VEVENT blocks for a finalized event.
+
+    A recurring event is one VEVENT with its RRULE, cancelled dates as EXDATEs, and one
+    more VEVENT (same UID, RECURRENCE-ID) per occurrence that was moved or changed.
+    """
+    url = base_url + reverse('eventpollapp:event_detail', args=[event.id])
+    extra, changed = [], []
+    if event.recurrence:
+        extra.append(f"RRULE:{event.recurrence}")
+        for override in event.occurrence_overrides.all():
+            if override.is_cancelled:
+                extra.append(f"EXDATE:{_utc(override.original_start)}")
+            else:
+                changed.append(_vevent_lines(
+                    event, url, override.start or override.original_start, override.location or event.location,
+                    [f"RECURRENCE-ID:{_utc(override.original_start)}"],
+                ))
+    lines = _vevent_lines(event, url, event.finalized_date, event.location, extra)
+    for override_lines in changed:
+        lines.extend(override_lines)
+    return ''.join(_fold(line) for line in lines)
+
+
+def calendar_chunks(events, base_url, name):
+    """Yield an iCalendar document piece by piece, one chunk per event"""
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f"PRODID:{PRODID}",
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f"X-WR-CALNAME:{_escape(name)}",
+    ])
+    for event in events:
+        yield vevent(event, base_url)
+    yield 'END:VCALENDAR\r\n'
+
+
+def feed_events(user_id):
+    """Finalized events the user created or takes part in, soonest first, read in chunks
+    with the overrides of each chunk's recurring events"""
+    return Event.objects.filter(
+        Q(creator_id=user_id) | Q(participants__user_id=user_id, participants__status__in=FEED_STATUSES),
+        is_date_finalized=True,
+    ).distinct().order_by('finalized_date', 'id').only(
+        'id', 'title', 'description', 'location', 'finalized_date', 'duration_minutes', 'recurrence', 'updated_at'
+    ).prefetch_related('occurrence_overrides').iterator(chunk_size=FEED_CHUNK_SIZE)
+
+
+def _token_key(token):
+    return f"ical:token:{token}"
+
+
+def feed_user_id(token):
+    """User id for a calendar feed token, or None; cached so polling clients skip the lookup"""
+    key = _token_key(token)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = Profile.objects.filter(calendar_token=token).values_list('user_id', flat=True).first()
+        if user_id is None:
+            return None
+        cache.set(key, user_id, FEED_CACHE_TIMEOUT)
+    return user_id
+
+
+def forget_token(token):
+    cache.delete(_token_key(token))
+
+
+def feed_version(user_id):
+    """Bumped whenever a finalized event in the user's feed changes (see the receivers in models.py)"""
+    return fragment_version(User, user_id, 'calendar')
+
+
+def stream_feed(user_id, version, base_url):
+    """Yield the user's feed, from the cache when this version was built before.
+
+    A freshly built feed is streamed as it is generated and stored once complete.
+    """
+    key = f"ical:feed:{user_id}:{version}"
+    body = cache.get(key)
+    if body is not None:
+        yield body
+        return
+    parts = []
+    for chunk in calendar_chunks(feed_events(user_id), base_url, 'Gather-ed events'):
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(parts), FEED_CACHE_TIMEOUT)
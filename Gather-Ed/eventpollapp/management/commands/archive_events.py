@@ -0,0 +1,24 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from eventpollapp.archive import ARCHIVE_AFTER_DAYS, BATCH_SIZE, archive_events
+
+
+class Command(BaseCommand):
+    help = 'Move long-past finalized events, with their votes, comments and requirements, into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=ARCHIVE_AFTER_DAYS,
+            help=f'Archive events that took place more than this many days ago (default {ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Events archived per transaction')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=max(0, options['days']))
+        started = time.monotonic()
+        archived = archive_events(before, batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} event(s) in {time.monotonic() - started:.2f}s.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from eventpollapp.tiebreak import finalize_due_events
+
+
+class Command(BaseCommand):
+    help = 'Finalize events whose voting deadline has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events finalized per transaction')
+        parser.add_argument(
+            '--every', type=float, default=0,
+            help='Keep running, checking for due polls every N seconds (default: run once, e.g. from cron)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        every = options['every']
+
+        while True:
+            close_old_connections()
+            started = time.monotonic()
+            finalized, skipped = finalize_due_events(batch_size=batch_size)
+            if finalized or skipped or not every:
+                message = f'Finalized {finalized} event(s) in {time.monotonic() - started:.2f}s.'
+                if skipped:
+                    message += f' {skipped} closed poll(s) had no date options and were left open.'
+                self.stdout.write(self.style.SUCCESS(message))
+            if not every:
+                return
+            try:
+                time.sleep(every)
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:50
+
+import eventpollapp.tiebreak
+from django.db import migrations, models
+
+
+def seed_existing_events(apps, schema_editor):
+    """AddField evaluates the default once, so give every existing event its own seed"""
+    Event = apps.get_model('eventpollapp', 'Event')
+    events = list(Event.objects.only('id'))
+    for event in events:
+        event.tiebreak_seed = eventpollapp.tiebreak.new_seed()
+    Event.objects.bulk_update(events, ['tiebreak_seed'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventpollapp', '0002_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='tiebreak_policy',
+            field=models.CharField(choices=[('seeded_random', 'Random draw (reproducible)'), ('earliest', 'Earliest date'), ('most_going', 'Most voters marked as going')], default='seeded_random', max_length=20, verbose_name='tie-break'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='tiebreak_record',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='tiebreak_seed',
+            field=models.PositiveIntegerField(default=eventpollapp.tiebreak.new_seed, editable=False),
+        ),
+        migrations.RunPython(seed_existing_events, migrations.RunPython.noop),
+    ]
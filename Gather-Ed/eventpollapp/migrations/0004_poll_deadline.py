@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_profile_picture_variants'),
+        ('eventpollapp', '0003_tiebreak'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='poll_closes_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='voting closes'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_date_finalized', False)), fields=['poll_closes_at'], name='event_poll_due_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_calendar_token'),
+        ('eventpollapp', '0004_poll_deadline'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('finalized_date', models.DateTimeField()),
+                ('location', models.CharField(blank=True, max_length=300)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('creator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_events_created', to=settings.AUTH_USER_MODEL)),
+                ('members', models.ManyToManyField(related_name='archived_events', to=settings.AUTH_USER_MODEL)),
+                ('required_role', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.role')),
+            ],
+            options={
+                'ordering': ['-finalized_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_calendar_token'),
+        ('eventpollapp', '0005_archived_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('start', models.DateTimeField(blank=True, null=True)),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('location', models.CharField(blank=True, max_length=300)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['original_start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence',
+            field=models.CharField(blank=True, max_length=200, verbose_name='repeats'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('recurrence', ''), _negated=True), fields=['finalized_date', 'recurrence_end'], name='event_series_idx'),
+        ),
+        migrations.AddField(
+            model_name='eventoccurrence',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_overrides', to='eventpollapp.event'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventoccurrence',
+            unique_together={('event', 'original_start')},
+        ),
+    ]
@@ -2,8 +2,13 @@
 
 from django.db import models
 from django.contrib.auth.models import User
-from accounts.models import Role
-import random
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.functional import cached_property
+from accounts.fragments import bump_fragment_versions
+from accounts.models import Profile, Role
+from . import recurrence, tiebreak
 
 class Event(models.Model):
     title = models.CharField(max_length=200)
@@ -13,65 +18,71 @@ class Event(models.Model):
     is_date_finalized = models.BooleanField(default=False)
     finalized_date = models.DateTimeField(null=True, blank=True)
     location = models.CharField(max_length=300, blank=True)
+    # How long the meetup runs; the availability planner looks for slots this long
+    duration_minutes = models.PositiveIntegerField(default=120)
+    # How ties on the most votes are broken; the seed and the outcome are kept for auditing
+    tiebreak_policy = models.CharField(
+        'tie-break', max_length=20, choices=tiebreak.POLICY_CHOICES, default=tiebreak.DEFAULT_POLICY
+    )
+    tiebreak_seed = models.PositiveIntegerField(default=tiebreak.new_seed, editable=False)
+    tiebreak_record = models.JSONField(null=True, blank=True, editable=False)
+    # Voting closes at this time and the event is finalized by the finalize_polls command
+    poll_closes_at = models.DateTimeField('voting closes', null=True, blank=True)
+    # RRULE text (see recurrence.py); the finalized date is the first occurrence
+    recurrence = models.CharField('repeats', max_length=200, blank=True)
+    # Start of the last occurrence, null while the series has no end; kept in step by save()
+    recurrence_end = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['poll_closes_at'], condition=models.Q(is_date_finalized=False), name='event_poll_due_idx'
+            ),
+            models.Index(
+                fields=['finalized_date', 'recurrence_end'], condition=~models.Q(recurrence=''),
+                name='event_series_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.recurrence_end = self.compute_recurrence_end()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'finalized_date', 'recurrence'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'recurrence_end'}
+        super().save(*args, **kwargs)
+
+    @cached_property
+    def rule(self):
+        return recurrence.Rule.parse(self.recurrence) if self.recurrence else None
+
+    def compute_recurrence_end(self):
+        if not self.recurrence or not self.finalized_date:
+            return None
+        return self.rule.last(self.finalized_date)
+
+    @property
+    def is_poll_closed(self):
+        return self.poll_closes_at is not None and self.poll_closes_at <= timezone.now()
+
     def get_winning_date_option(self):
-        """Get the date option with the most votes"""
+        """Get the date option with the most votes, breaking ties with the event's tie-break policy"""
         if self.is_date_finalized and self.finalized_date:
             return self.dateoption_set.filter(proposed_date=self.finalized_date).first()
-        
-        vote_counts = []
-        for date_option in self.dateoption_set.all():
-            vote_count = date_option.votes.count()
-            vote_counts.append((date_option, vote_count))
-        
-        if not vote_counts:
-            return None
-        
-        # Sort by vote count (descending)
-        vote_counts.sort(key=lambda x: x[1], reverse=True)
-        
-        # Check for ties at the top
-        max_votes = vote_counts[0][1]
-        tied_options = [option for option, count in vote_counts if count == max_votes]
-        
-        if len(tied_options) > 1:
-            # Random selection for tie-breaking
-            return random.choice(tied_options)
-        
-        return tied_options[0]
-
-    def finalize_date(self):
+        return tiebreak.pick_winner(self)[0]
+
+    def finalize_date(self, policy=None):
         """Finalize the event date based on voting"""
-        winning_option = self.get_winning_date_option()
-        if winning_option:
-            self.finalized_date = winning_option.proposed_date
-            self.is_date_finalized = True
-            self.save()
-        return winning_option
+        return tiebreak.finalize(self, policy)
     
     def get_top_voted_options(self):
         """Return the top voted options (handles ties)"""
-        vote_counts = []
-        for date_option in self.dateoption_set.all():
-            vote_count = date_option.votes.count()
-            vote_counts.append((date_option, vote_count))
-
-        if not vote_counts:
-            return []
-
-        vote_counts.sort(key=lambda x: x[1], reverse=True)
-        max_votes = vote_counts[0][1]
-
-        tied_options = [option for option, count in vote_counts if count == max_votes]
-        return tied_options
+        return tiebreak.top_options(tiebreak.ranked_options(self))
 
 
 class DateOption(models.Model):
@@ -161,4 +172,143 @@ class EventParticipant(models.Model):
         unique_together = ['event', 'user']
 
     def __str__(self):
-        return f"{self.user.username} - {self.event.title} ({self.status})"
\ No newline at end of file
+        return f"{self.user.username} - {self.event.title} ({self.status})"
+
+
+class Availability(models.Model):
+    """A window of time in which a participant is free for the event"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='availability')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availability')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['start']
+        indexes = [models.Index(fields=['event', 'start'], name='availability_event_idx')]
+
+    def __str__(self):
+        return f"{self.user.username} free {self.start:%Y-%m-%d %H:%M} - {self.end:%Y-%m-%d %H:%M}"
+
+
+class EventOccurrence(models.Model):
+    """A change to one occurrence of a recurring event, found by the start the rule gives it"""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrence_overrides')
+    original_start = models.DateTimeField()
+    # Set when the occurrence was moved
+    start = models.DateTimeField(null=True, blank=True)
+    is_cancelled = models.BooleanField(default=False)
+    location = models.CharField(max_length=300, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['event', 'original_start']
+        ordering = ['original_start']
+
+    def __str__(self):
+        return f"{self.event.title} on {self.original_start:%Y-%m-%d %H:%M}"
+
+
+class ArchivedEvent(models.Model):
+    """A long-past event moved out of the hot tables by the archive_events command.
+
+    Keeps the event's id, so old links still resolve, and the few columns needed to list and
+    authorize it; everything else (date options and votes, participants, requirements and
+    comments) is one compressed JSON document in ``data`` (see archive.py).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_events_created')
+    required_role = models.ForeignKey(Role, on_delete=models.CASCADE, null=True, blank=True)
+    finalized_date = models.DateTimeField()
+    location = models.CharField(max_length=300, blank=True)
+    # The creator and participants, for listing a user's past events
+    members = models.ManyToManyField(User, related_name='archived_events')
+    data = models.BinaryField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-finalized_date']
+
+    def __str__(self):
+        return self.title
+
+
+# Sections of the event page are versioned per event, for its cached fragments and ETag
+@receiver([post_save, post_delete], sender=EventComment)
+def comment_changed(sender, instance, **kwargs):
+    bump_fragment_versions(Event, [instance.event_id], 'comments')
+
+
+@receiver([post_save, post_delete], sender=EventRequirement)
+def requirement_changed(sender, instance, **kwargs):
+    bump_fragment_versions(Event, [instance.event_id], 'requirements')
+
+
+@receiver([post_save, post_delete], sender=DateOption)
+def date_option_changed(sender, instance, **kwargs):
+    bump_fragment_versions(Event, [instance.event_id], 'votes')
+
+
+@receiver([post_save, post_delete], sender=DateVote)
+def vote_changed(sender, instance, **kwargs):
+    # Empty when the vote went with its date option, which bumps the event itself
+    event_ids = DateOption.objects.filter(pk=instance.date_option_id).values_list('event_id', flat=True)
+    bump_fragment_versions(Event, event_ids, 'votes')
+
+
+@receiver([post_save, post_delete], sender=Availability)
+def availability_changed(sender, instance, **kwargs):
+    bump_fragment_versions(Event, [instance.event_id], 'availability')
+
+
+@receiver([post_save, post_delete], sender=EventParticipant)
+def participant_changed(sender, instance, **kwargs):
+    bump_fragment_versions(Event, [instance.event_id], 'participants')
+    # Joining, leaving or changing status can add or drop the event in the user's calendar feed
+    bump_fragment_versions(User, [instance.user_id], 'calendar')
+
+
+# Calendar feeds are versioned per user (see ical.py)
+def calendar_user_ids(event_ids):
+    """Everyone whose calendar feed can include the given events"""
+    creators = Event.objects.filter(id__in=event_ids).values_list('creator_id', flat=True)
+    participants = EventParticipant.objects.filter(event_id__in=event_ids).values_list('user_id', flat=True)
+    return {*creators, *participants}
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, **kwargs):
+    if instance.is_date_finalized:
+        bump_fragment_versions(User, calendar_user_ids([instance.id]), 'calendar')
+
+
+@receiver([post_save, post_delete], sender=EventOccurrence)
+def occurrence_changed(sender, instance, **kwargs):
+    bump_fragment_versions(Event, [instance.event_id], 'occurrences')
+    bump_fragment_versions(User, calendar_user_ids([instance.event_id]), 'calendar')
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    # Participants were deleted first and bumped their own feeds
+    if instance.is_date_finalized:
+        bump_fragment_versions(User, [instance.creator_id], 'calendar')
+
+
+@receiver(post_save, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    # Names and pictures are shown next to the user's comments, requirements and participation
+    user_id = instance.user_id
+    bump_fragment_versions(
+        Event, EventComment.objects.filter(user_id=user_id).values_list('event_id', flat=True), 'comments'
+    )
+    bump_fragment_versions(
+        Event, EventRequirement.objects.filter(assigned_to_id=user_id).values_list('event_id', flat=True), 'requirements'
+    )
+    bump_fragment_versions(
+        Event, EventParticipant.objects.filter(user_id=user_id).values_list('event_id', flat=True), 'participants'
+    )
@@ -0,0 +1,272 @@
+# Path: eventpollapp/recurrence.py
+
+import calendar
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+
+DAILY = 'DAILY'
+WEEKLY = 'WEEKLY'
+MONTHLY = 'MONTHLY'
+
+FREQUENCY_CHOICES = [
+    ('', 'Does not repeat'),
+    (DAILY, 'Daily'),
+    (WEEKLY, 'Weekly'),
+    (MONTHLY, 'Monthly'),
+]
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+WEEKDAY_CHOICES = list(zip(WEEKDAYS, ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']))
+MAX_COUNT = 1000
+
+
+@dataclass(frozen=True)
+class Rule:
+    """The subset of an RFC 5545 RRULE the app supports.
+
+    FREQ is DAILY, WEEKLY or MONTHLY, with an optional INTERVAL, BYDAY (weekly only; defaults
+    to the weekday of the first occurrence) and COUNT or UNTIL. Monthly rules repeat on the
+    day of the month of the first occurrence and skip months that don't have that day.
+    """
+    freq: str
+    interval: int = 1
+    byday: tuple = ()  # weekday numbers, Monday is 0
+    count: int = None
+    until: datetime = None
+
+    @classmethod
+    def parse(cls, text):
+        """Rule from RRULE text such as ``FREQ=WEEKLY;BYDAY=MO,TH;COUNT=10``; ValueError if unsupported"""
+        parts = {}
+        for part in text.strip().removeprefix('RRULE:').split(';'):
+            name, _, value = part.partition('=')
+            if not value:
+                raise ValueError(f"Invalid rule part '{part}'.")
+            parts[name.upper()] = value.upper()
+
+        freq = parts.pop('FREQ', None)
+        if freq not in (DAILY, WEEKLY, MONTHLY):
+            raise ValueError('FREQ must be DAILY, WEEKLY or MONTHLY.')
+        try:
+            interval = int(parts.pop('INTERVAL', 1))
+            count = int(parts.pop('COUNT')) if 'COUNT' in parts else None
+        except ValueError:
+            raise ValueError('INTERVAL and COUNT must be whole numbers.')
+        byday = ()
+        if 'BYDAY' in parts:
+            if freq != WEEKLY:
+                raise ValueError('BYDAY is only supported for weekly rules.')
+            try:
+                byday = tuple(sorted({WEEKDAYS.index(day) for day in parts.pop('BYDAY').split(',')}))
+            except ValueError:
+                raise ValueError(f"BYDAY takes days from {','.join(WEEKDAYS)}.")
+        until = None
+        if 'UNTIL' in parts:
+            try:
+                until = datetime.strptime(parts.pop('UNTIL'), '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                raise ValueError('UNTIL must look like 20261231T235959Z.')
+        if parts:
+            raise ValueError(f"Unsupported rule part(s): {', '.join(parts)}.")
+        return cls(freq, interval, byday, count, until).validated()
+
+    def validated(self):
+        if self.interval < 1:
+            raise ValueError('INTERVAL must be at least 1.')
+        if self.count is not None and not 1 <= self.count <= MAX_COUNT:
+            raise ValueError(f'COUNT must be between 1 and {MAX_COUNT}.')
+        if self.count is not None and self.until is not None:
+            raise ValueError('Use either COUNT or UNTIL, not both.')
+        return self
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append(f"BYDAY={','.join(WEEKDAYS[day] for day in self.byday)}")
+        if self.count is not None:
+            parts.append(f'COUNT={self.count}')
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}")
+        return ';'.join(parts)
+
+    def describe(self):
+        """Readable summary, e.g. 'Every 2 weeks on Mon, Thu, 10 times'"""
+        unit = {DAILY: 'day', WEEKLY: 'week', MONTHLY: 'month'}[self.freq]
+        text = f'Every {unit}' if self.interval == 1 else f'Every {self.interval} {unit}s'
+        if self.byday:
+            text += ' on ' + ', '.join(WEEKDAY_CHOICES[day][1] for day in self.byday)
+        if self.count is not None:
+            text += f', {self.count} times'
+        elif self.until is not None:
+            text += f", until {timezone.localtime(self.until):%b %d, %Y}"
+        return text
+
+    def between(self, dtstart, start, end=None):
+        """Occurrence starts in [start, end), in order, computed lazily.
+
+        The generator jumps straight to ``start`` instead of walking the series from
+        ``dtstart``, so a month of a years-old series costs the same as its first month.
+        Without ``end`` it runs until the rule ends (forever for open-ended rules).
+        The series repeats in local wall-clock time, so it keeps its hour across DST.
+        """
+        tz = timezone.get_current_timezone()
+        first = timezone.localtime(dtstart, tz).replace(tzinfo=None)
+        window_start = max(timezone.localtime(start, tz).replace(tzinfo=None), first)
+        window_end = timezone.localtime(end, tz).replace(tzinfo=None) if end else None
+
+        for index, local in self._walk(first, window_start):
+            if window_end is not None and local >= window_end:
+                return
+            if self.count is not None and index >= self.count:
+                return
+            occurrence = timezone.make_aware(local, tz)
+            if self.until is not None and occurrence > self.until:
+                return
+            if local >= window_start:
+                yield occurrence
+
+    def _walk(self, first, window_start):
+        """(index in the series, local start) pairs from about ``window_start`` onwards"""
+        if self.freq == DAILY:
+            period = timedelta(days=self.interval)
+            k = max(0, (window_start - first) // period)
+            while True:
+                yield k, first + k * period
+                k += 1
+
+        elif self.freq == WEEKLY:
+            days = self.byday or (first.weekday(),)
+            week = first - timedelta(days=first.weekday())
+            # Days of the first week before the first occurrence aren't part of the series
+            skipped = sum(1 for day in days if day < first.weekday())
+            period = timedelta(weeks=self.interval)
+            p = max(0, (window_start - week) // period)
+            while True:
+                for position, day in enumerate(days):
+                    index = p * len(days) + position - skipped
+                    if index >= 0:
+                        yield index, week + p * period + timedelta(days=day)
+                p += 1
+
+        else:
+            # With a day that some months lack, the index depends on the months skipped before,
+            # so count from the start; COUNT bounds that walk
+            months = (window_start.year - first.year) * 12 + window_start.month - first.month
+            k = 0 if first.day > 28 and self.count is not None else max(0, months // self.interval)
+            index = k
+            while True:
+                year, month = divmod(first.month - 1 + k * self.interval, 12)
+                year += first.year
+                if first.day <= calendar.monthrange(year, month + 1)[1]:
+                    yield index, first.replace(year=year, month=month + 1)
+                    index += 1
+                k += 1
+
+    def last(self, dtstart):
+        """Start of the final occurrence (at most UNTIL), or None for a series without an end"""
+        if self.count is None:
+            # Close enough for deciding which series can show up in a window
+            return self.until
+        occurrence = None
+        for occurrence in self.between(dtstart, dtstart):
+            pass
+        return occurrence
+
+    def includes(self, dtstart, moment):
+        return next(self.between(dtstart, moment, moment + timedelta(seconds=1)), None) == moment
+
+
+@dataclass
+class Occurrence:
+    """One showing of an event: the only one for a one-off event, or one of a series"""
+    event: object
+    start: datetime
+    original_start: datetime
+    override: object = None
+
+    @property
+    def title(self):
+        return self.event.title
+
+    @property
+    def location(self):
+        return (self.override and self.override.location) or self.event.location
+
+    @property
+    def note(self):
+        return self.override.note if self.override else ''
+
+    @property
+    def is_moved(self):
+        return self.start != self.original_start
+
+
+def _occurrences(event, overrides, start, end):
+    """The event's occurrences starting in [start, end) in order, with its overrides applied"""
+    def in_window(moment):
+        return start <= moment and (end is None or moment < end)
+
+    if not event.recurrence:
+        if event.finalized_date and in_window(event.finalized_date):
+            yield Occurrence(event, event.finalized_date, event.finalized_date)
+        return
+
+    rule, dtstart = event.rule, event.finalized_date
+    by_original = {override.original_start: override for override in overrides}
+    # Moved occurrences are placed by their new start, wherever the rule had them
+    moved = sorted(
+        (
+            Occurrence(event, override.start, override.original_start, override)
+            for override in overrides
+            if override.start and not override.is_cancelled and in_window(override.start)
+            and rule.includes(dtstart, override.original_start)
+        ),
+        key=lambda occurrence: occurrence.start,
+    )
+    for original in rule.between(dtstart, start, end):
+        override = by_original.get(original)
+        if override is not None and (override.is_cancelled or override.start):
+            continue
+        while moved and moved[0].start <= original:
+            yield moved.pop(0)
+        yield Occurrence(event, original, original, override)
+    yield from moved
+
+
+def expand(events, start, end):
+    """Occurrences of the given events starting in [start, end), soonest first.
+
+    Overrides for all recurring events are read in one query, and each series is only
+    expanded across the window, so nothing is stored per occurrence.
+    """
+    from .models import EventOccurrence
+
+    events = list(events)
+    overrides = {}
+    recurring = [event.id for event in events if event.recurrence]
+    if recurring:
+        # Only overrides of dates in the window, or moved into it, matter
+        in_window = EventOccurrence.objects.filter(
+            Q(original_start__gte=start, original_start__lt=end) | Q(start__gte=start, start__lt=end),
+            event_id__in=recurring,
+        )
+        for override in in_window:
+            overrides.setdefault(override.event_id, []).append(override)
+
+    occurrences = []
+    for event in events:
+        occurrences.extend(_occurrences(event, overrides.get(event.id, []), start, end))
+    occurrences.sort(key=lambda occurrence: (occurrence.start, occurrence.event.id))
+    return occurrences
+
+
+def upcoming(event, after=None, limit=6):
+    """The next few occurrences of an event from ``after`` (default now)"""
+    after = after or timezone.now()
+    overrides = list(event.occurrence_overrides.all()) if event.recurrence else []
+    return list(islice(_occurrences(event, overrides, after, None), limit))
@@ -0,0 +1,156 @@
+# Path: eventpollapp/scheduling.py
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from django.utils import timezone as django_timezone
+
+SLOT = timedelta(minutes=15)
+
+# How much each participant's availability counts, by participation status
+STATUS_WEIGHTS = {
+    'going': 1.0,
+    'maybe': 0.5,
+    'interested': 0.5,
+    'not_going': 0.0,
+}
+# The organiser has to be there, so their availability counts double
+CREATOR_WEIGHT = 2.0
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class Slot:
+    start: datetime
+    end: datetime
+    score: float
+    attendees: tuple  # user ids free for the whole slot
+
+
+def _merged(intervals):
+    """Sort and coalesce overlapping or touching [start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def best_slots(windows, duration, weights=None, limit=5, slot=SLOT):
+    """The best non-overlapping times to meet for ``duration``, given everyone's free windows.
+
+    ``windows`` yields (user id, start, end) with aware datetimes; ``weights`` maps user id to
+    how much their attendance counts (default 1, users weighted 0 are ignored). Start times are
+    on a ``slot`` grid. Slots are ranked by weighted attendance, then head count, then start.
+
+    Rather than scoring every grid slot, each user's merged windows become the range of start
+    times they could make, and one sweep over the sorted range boundaries yields every run of
+    start times with a constant score. Cost is O(w log w) in the number of windows, whatever
+    the length of the period.
+    """
+    step = slot.total_seconds()
+    length = max(1, int(-(-duration.total_seconds() // step)))  # duration in slots, rounded up
+    weights = weights or {}
+
+    by_user = defaultdict(list)
+    for user_id, start, end in windows:
+        by_user[user_id].append(((start - _EPOCH).total_seconds(), (end - _EPOCH).total_seconds()))
+
+    free = {}
+    boundaries = []
+    for user_id, intervals in by_user.items():
+        weight = weights.get(user_id, 1.0)
+        if weight <= 0:
+            continue
+        # Merge first, then snap inwards to the grid: a window only counts for slots it fully covers
+        free[user_id] = [
+            (first, last)
+            for first, last in ((int(-(-start // step)), int(end // step)) for start, end in _merged(intervals))
+            if last > first
+        ]
+        for first, last in free[user_id]:
+            # Meetings starting in [first, last - length] fit inside the window
+            if last - length >= first:
+                boundaries.append((first, weight, 1))
+                boundaries.append((last - length + 1, -weight, -1))
+
+    # Sweep: ends sort before starts at the same position because their weight is negative
+    boundaries.sort()
+    runs = []
+    score = 0.0
+    count = 0
+    for index, (position, weight, delta) in enumerate(boundaries):
+        score += weight
+        count += delta
+        next_position = boundaries[index + 1][0] if index + 1 < len(boundaries) else None
+        if count and next_position is not None and next_position > position:
+            runs.append((round(score, 6), count, position, next_position))
+
+    # Best runs first; within a run the earliest start, and picks may not overlap each other
+    runs.sort(key=lambda run: (-run[0], -run[1], run[2]))
+    chosen = []
+    for run_score, _, first, end in runs:
+        if len(chosen) >= limit:
+            break
+        start = next(
+            (
+                position for position in _candidates(first, end, chosen, length)
+                if all(abs(position - other) >= length for other, _ in chosen)
+            ),
+            None,
+        )
+        if start is not None:
+            chosen.append((start, run_score))
+
+    slots = []
+    for start, run_score in chosen:
+        attendees = tuple(sorted(
+            user_id for user_id, intervals in free.items()
+            if any(first <= start and start + length <= last for first, last in intervals)
+        ))
+        slots.append(Slot(
+            start=_EPOCH + slot * start,
+            end=_EPOCH + slot * (start + length),
+            score=run_score,
+            attendees=attendees,
+        ))
+    return slots
+
+
+def _candidates(first, end, chosen, length):
+    """Start positions in [first, end) worth trying: the run start and just after each chosen slot"""
+    yield first
+    for other, _ in chosen:
+        after = other + length
+        if first < after < end:
+            yield after
+
+
+def participant_weights(event):
+    """user id -> weight from the participants' status, with the creator counted as going at CREATOR_WEIGHT"""
+    weights = {
+        user_id: STATUS_WEIGHTS.get(status, 0.0)
+        for user_id, status in event.participants.values_list('user_id', 'status')
+    }
+    weights[event.creator_id] = CREATOR_WEIGHT
+    return weights
+
+
+def event_best_slots(event, limit=5):
+    """best_slots() over the availability submitted for the event"""
+    now = django_timezone.now()
+    # Windows that have already begun only count from now, so no suggested slot is in the past
+    windows = [
+        (user_id, max(start, now), end)
+        for user_id, start, end in event.availability.filter(end__gt=now).values_list('user_id', 'start', 'end')
+    ]
+    return best_slots(
+        windows,
+        timedelta(minutes=event.duration_minutes),
+        weights=participant_weights(event),
+        limit=limit,
+    )
@@ -0,0 +1,204 @@
+# Path: eventpollapp/tiebreak.py
+
+import random
+import secrets
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.utils import timezone
+
+from accounts.fragments import bump_fragment_versions
+
+EARLIEST = 'earliest'
+MOST_GOING = 'most_going'
+SEEDED_RANDOM = 'seeded_random'
+
+POLICY_CHOICES = [
+    (SEEDED_RANDOM, 'Random draw (reproducible)'),
+    (EARLIEST, 'Earliest date'),
+    (MOST_GOING, 'Most voters marked as going'),
+]
+DEFAULT_POLICY = SEEDED_RANDOM
+
+
+def new_seed():
+    """Seed for an event's random draw, fixed when the event is created so the draw can be replayed"""
+    return secrets.randbits(31)
+
+
+def _earliest(event, tied):
+    return min(tied, key=lambda option: (option.proposed_date, option.id))
+
+
+def _most_going(event, tied):
+    # Options with as many going voters fall back to the earliest date
+    return min(tied, key=lambda option: (-option.going_votes, option.proposed_date, option.id))
+
+
+def _seeded_random(event, tied):
+    # Draw from a fixed order so the same seed and options always give the same winner
+    return random.Random(event.tiebreak_seed).choice(sorted(tied, key=lambda option: option.id))
+
+
+# policy -> function(event, tied options) returning the winner; register new policies here
+POLICIES = {
+    EARLIEST: _earliest,
+    MOST_GOING: _most_going,
+    SEEDED_RANDOM: _seeded_random,
+}
+
+
+def going_votes():
+    """Subquery counting a date option's votes from participants marked as going"""
+    from .models import DateVote
+
+    return Subquery(
+        DateVote.objects.filter(
+            date_option=OuterRef('pk'),
+            user__eventparticipant__event=OuterRef('event'),
+            user__eventparticipant__status='going',
+        ).order_by().values('date_option').annotate(c=Count('id')).values('c'),
+        output_field=IntegerField(),
+    )
+
+
+def with_tallies(options):
+    """Annotate a DateOption queryset with vote and going-voter counts, most votes first"""
+    return options.annotate(num_votes=Count('votes'), going_votes=going_votes()).order_by(
+        '-num_votes', 'proposed_date', 'id'
+    )
+
+
+def ranked_options(event):
+    """The event's date options with their tallies, in one query"""
+    from .models import DateOption
+
+    return list(with_tallies(DateOption.objects.filter(event=event)))
+
+
+def top_options(options):
+    """Options tied on the most votes"""
+    if not options:
+        return []
+    return [option for option in options if option.num_votes == options[0].num_votes]
+
+
+def pick_winner(event, options=None, policy=None):
+    """Winning option and the tied options it was picked from, without saving anything"""
+    if options is None:
+        options = ranked_options(event)
+    tied = top_options(options)
+    if not tied:
+        return None, []
+    for option in tied:
+        if option.going_votes is None:
+            option.going_votes = 0
+    if len(tied) == 1:
+        return tied[0], tied
+    return POLICIES[policy or event.tiebreak_policy](event, tied), tied
+
+
+def _record(policy, seed, tied, winner):
+    return {
+        'policy': policy,
+        'seed': seed,
+        'tied': [
+            {
+                'id': option.id,
+                'date': option.proposed_date.isoformat(),
+                'votes': option.num_votes,
+                'going': option.going_votes,
+            }
+            for option in tied
+        ],
+        'winner': winner.id,
+    }
+
+
+def finalize(event, policy=None):
+    """Pick the winning option and finalize the event on it.
+
+    The policy, seed, tied options with their counts and the winner are stored in
+    ``event.tiebreak_record``, so the outcome can be audited and replayed later.
+    Returns the winning option, or None if there is nothing to finalize.
+    """
+    from .models import Event
+
+    policy = policy or event.tiebreak_policy
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown tie-break policy '{policy}'.")
+
+    with transaction.atomic():
+        # Lock the row so two finalize requests can't pick different winners
+        locked = Event.objects.select_for_update().get(pk=event.pk)
+        if locked.is_date_finalized:
+            return None
+        winner, tied = pick_winner(locked, policy=policy)
+        if winner is None:
+            return None
+
+        event.tiebreak_policy = policy
+        event.tiebreak_seed = locked.tiebreak_seed
+        event.finalized_date = winner.proposed_date
+        event.is_date_finalized = True
+        event.tiebreak_record = _record(policy, locked.tiebreak_seed, tied, winner)
+        event.save(update_fields=[
+            'tiebreak_policy', 'tiebreak_seed', 'tiebreak_record', 'finalized_date', 'is_date_finalized',
+            'updated_at',
+        ])
+    return winner
+
+
+def finalize_due_events(now=None, batch_size=500):
+    """Finalize every event whose poll deadline has passed, a batch at a time.
+
+    Each batch takes one query for the events, one for the tallies of all their
+    options and a few bulk updates, however many events are due. Events with no
+    date options can't be finalized; their deadline is cleared so later runs
+    skip them. Returns (finalized, skipped).
+    """
+    from .models import DateOption, Event, calendar_user_ids
+
+    now = now or timezone.now()
+    finalized = skipped = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                Event.objects.select_for_update(skip_locked=True).filter(
+                    is_date_finalized=False, poll_closes_at__lte=now, id__gt=last_id
+                ).order_by('id')[:batch_size]
+            )
+            if not events:
+                break
+            last_id = events[-1].id
+
+            options = {}
+            for option in with_tallies(DateOption.objects.filter(event__in=events)):
+                options.setdefault(option.event_id, []).append(option)
+
+            done, empty = [], []
+            for event in events:
+                winner, tied = pick_winner(event, options.get(event.id, []))
+                if winner is None:
+                    empty.append(event.id)
+                    continue
+                event.finalized_date = winner.proposed_date
+                event.tiebreak_record = _record(event.tiebreak_policy, event.tiebreak_seed, tied, winner)
+                event.recurrence_end = event.compute_recurrence_end()
+                done.append(event)
+
+            # Only the per-event columns go through bulk_update's CASE expressions
+            fields = ['finalized_date', 'tiebreak_record']
+            if any(event.recurrence for event in done):
+                fields.append('recurrence_end')
+            Event.objects.bulk_update(done, fields, batch_size=batch_size)
+            done_ids = [event.id for event in done]
+            Event.objects.filter(id__in=done_ids).update(is_date_finalized=True, updated_at=now)
+            # update() skips the post_save receivers that refresh calendar feeds
+            bump_fragment_versions(User, calendar_user_ids(done_ids), 'calendar')
+            Event.objects.filter(id__in=empty).update(poll_closes_at=None)
+            finalized += len(done)
+            skipped += len(empty)
+    return finalized, skipped
@@ -12,8 +12,18 @@ urlpatterns = [
     path('events/<int:event_id>/finalize/', views.finalize_event_date, name='finalize_event_date'),
     path('events/<int:event_id>/requirements/add/', views.add_requirement, name='add_requirement'),
     path('requirements/<int:requirement_id>/toggle/', views.toggle_requirement_completion, name='toggle_requirement_completion'),
+    path('events/<int:event_id>/comments/', views.event_comments, name='event_comments'),
     path('events/<int:event_id>/comments/add/', views.add_comment, name='add_comment'),
     path('events/<int:event_id>/participation/', views.update_participation, name='update_participation'),
+    path('events/<int:event_id>/availability/', views.add_availability, name='add_availability'),
+    path('availability/<int:availability_id>/delete/', views.delete_availability, name='delete_availability'),
+    path('events/<int:event_id>/propose-slot/', views.propose_slot, name='propose_slot'),
+    path('events/<int:event_id>/occurrence/', views.edit_occurrence, name='edit_occurrence'),
+    path('events/<int:event_id>/event.ics', views.event_ics, name='event_ics'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('calendar/reset/', views.reset_calendar_token, name='reset_calendar_token'),
+    path('archive/', views.archived_event_list, name='archived_event_list'),
+    path('archive/<int:event_id>/', views.archived_event_detail, name='archived_event_detail'),
     path('<int:event_id>/delete/', views.delete_event, name='delete_event'),
     path('<int:event_id>/edit/', views.edit_event, name='edit_event'),
 ]
\ No newline at end of file
@@ -3,28 +3,87 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
 from django.db.models import Q, Count
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
-from accounts.models import Friendship, UserRole
-from .models import Event, DateOption, DateVote, EventRequirement, EventComment, EventParticipant
-from .forms import EventForm, DateOptionForm, EventRequirementForm, EventCommentForm, EventParticipationForm
+from accounts.conditional import conditional_page
+from accounts.fragments import fragment_version, fragment_versions, version_timestamp
+from accounts.loaders import get_user_loader
+from accounts.models import Friendship, Profile, UserRole, new_calendar_token
+from notifications.delivery import notify_comment, notify_votes
+from .models import ArchivedEvent, Availability, Event, DateOption, EventOccurrence, DateVote, EventRequirement, EventComment, EventParticipant
+from .forms import AvailabilityForm, EventForm, EventOccurrenceForm, DateOptionForm, EventRequirementForm, EventCommentForm, EventParticipationForm
+from .scheduling import SLOT, event_best_slots
+from . import archive, ical, recurrence, tiebreak
 from datetime import datetime
 import calendar
 
+COMMENTS_PAGE_SIZE = 20
+MAX_COMMENTS_PAGE_SIZE = 100
+ICS_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+ARCHIVED_EVENTS_PER_PAGE = 30
+
+
+class CommentPage(list):
+    """Comments in posting order, plus whether more exist beyond the page"""
+    has_more = False
+
+
+def comment_page(event, users, before=None, since=None, limit=COMMENTS_PAGE_SIZE):
+    """One keyset-paginated page of an event's comments (ids only grow, so they double as the cursor).
+
+    Without ``since`` this is the latest ``limit`` comments older than ``before`` (default: all);
+    with it, the first ``limit`` comments posted after that id, for polling.
+    """
+    comments = event.comments.order_by()
+    if since is not None:
+        rows = list(comments.filter(id__gt=since).order_by('id')[:limit + 1])
+        page = CommentPage(rows[:limit])
+    else:
+        if before is not None:
+            comments = comments.filter(id__lt=before)
+        rows = list(comments.order_by('-id')[:limit + 1])
+        page = CommentPage(reversed(rows[:limit]))
+    page.has_more = len(rows) > limit
+    users.attach(page, 'user')
+    return page
+
+
+def comment_json(request, comment):
+    return {
+        'id': comment.id,
+        'user': comment.user.username,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+        'html': render_to_string('eventpollapp/comment_item.html', {'comment': comment}, request=request),
+    }
+
+
 @login_required
 def dashboard(request):
     """Main dashboard with calendar view"""
     now = datetime.now()
     month = int(request.GET.get('month', now.month))
     year = int(request.GET.get('year', now.year))
+    month_start = timezone.make_aware(datetime(year, month, 1))
+    month_end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
 
+    # One-off events in the month, and series that may have occurrences in it; the
+    # series are expanded for this month only
     user_events = Event.objects.filter(
         Q(creator=request.user) | Q(participants__user=request.user)
     ).filter(
-        finalized_date__month=month,
-        finalized_date__year=year,
+        Q(finalized_date__gte=month_start, finalized_date__lt=month_end) |
+        (~Q(recurrence='') & Q(finalized_date__lt=month_end) & (
+            Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=month_start)
+        )) |
+        Q(occurrence_overrides__start__gte=month_start, occurrence_overrides__start__lt=month_end),
         is_date_finalized=True
     ).distinct()
 
@@ -38,11 +97,11 @@ def dashboard(request):
     calendar_days = cal.monthdays2calendar(year, month)
 
     events_by_day = {}
-    for event in user_events:
-        day = event.finalized_date.day
+    for occurrence in recurrence.expand(user_events, month_start, month_end):
+        day = timezone.localtime(occurrence.start).day
         if day not in events_by_day:
             events_by_day[day] = []
-        events_by_day[day].append(event)
+        events_by_day[day].append(occurrence)
 
     context = {
         'current_month': month,
@@ -111,10 +170,41 @@ def create_event(request):
     return render(request, 'eventpollapp/create_event.html', {'form': form})
 
 
+def event_fingerprint(request, event_id):
+    row = Event.objects.filter(pk=event_id).values_list(
+        'updated_at', 'recurrence', 'is_date_finalized', 'poll_closes_at'
+    ).first()
+    if row is None:
+        return None
+    updated_at, rule, is_date_finalized, poll_closes_at = row
+    now = timezone.now()
+    versions = fragment_versions(
+        Event, event_id, ['comments', 'requirements', 'participants', 'votes', 'availability', 'occurrences']
+    )
+    last_modified = max(updated_at, *(version_timestamp(version) for version in versions.values()))
+    parts = [updated_at.isoformat(), *versions.values(), poll_closes_at is not None and poll_closes_at <= now]
+    if not is_date_finalized:
+        # Suggested slots start on the SLOT grid from now, and windows drop off the page once they end
+        parts.append(int(now.timestamp() // SLOT.total_seconds()))
+        parts.append(Availability.objects.filter(event_id=event_id, end__gt=now).count())
+    if rule:
+        # The upcoming dates move on as days pass
+        parts.append(timezone.localdate().isoformat())
+    return parts, last_modified
+
+
 @login_required
+@conditional_page(event_fingerprint)
 def event_detail(request, event_id):
     """View event details with voting and collaboration"""
-    event = get_object_or_404(Event, id=event_id)
+    event = Event.objects.filter(id=event_id).first()
+    if event is None:
+        # Old links keep working once the event has been archived
+        if ArchivedEvent.objects.filter(id=event_id).exists():
+            return redirect('eventpollapp:archived_event_detail', event_id=event_id)
+        raise Http404
+    users = get_user_loader()
+    users.attach([event], 'creator')
 
     can_access = (
         event.creator == request.user or
@@ -134,6 +224,22 @@ def event_detail(request, event_id):
         vote_count=Count('votes')
     ).order_by('-vote_count', 'proposed_date')
 
+    # Only loaded when the template's cached fragment for the section is stale; users come from the identity map
+    comments = SimpleLazyObject(lambda: comment_page(event, users))
+    participants = SimpleLazyObject(lambda: users.attach(event.participants.all(), 'user'))
+    requirements = SimpleLazyObject(lambda: users.attach(event.requirements.all(), 'assigned_to'))
+
+    def load_best_slots():
+        slots = event_best_slots(event)
+        attendees = users.load_many({user_id for slot in slots for user_id in slot.attendees})
+        return [
+            {'slot': slot, 'attendees': [attendees[user_id] for user_id in slot.attendees if user_id in attendees]}
+            for slot in slots
+        ]
+
+    best_slots = SimpleLazyObject(load_best_slots)
+    my_availability = Availability.objects.filter(event=event, user=request.user, end__gt=timezone.now())
+
     comment_form = EventCommentForm()
     requirement_form = EventRequirementForm(event)
 
@@ -145,15 +251,29 @@ def event_detail(request, event_id):
 
     participation_form = EventParticipationForm(initial={'status': current_status})
 
+    if event.is_date_finalized and event.recurrence:
+        occurrences = recurrence.upcoming(event)
+        occurrence_changes = event.occurrence_overrides.filter(original_start__gte=timezone.now())
+    else:
+        occurrences = occurrence_changes = []
+
     context = {
         'event': event,
         'date_options': date_options,
+        'comments': comments,
+        'participants': participants,
+        'requirements': requirements,
+        'best_slots': best_slots,
+        'my_availability': my_availability,
+        'availability_form': AvailabilityForm(),
         'user_votes': user_votes,
         'comment_form': comment_form,
         'requirement_form': requirement_form,
         'participation_form': participation_form,
         'current_status': current_status,
         'can_edit': event.creator == request.user,
+        'occurrences': occurrences,
+        'occurrence_changes': occurrence_changes,
     }
 
     return render(request, 'eventpollapp/event_detail.html', context)
@@ -177,6 +297,9 @@ def vote_date(request, event_id, date_option_id):
     if event.is_date_finalized:
         return JsonResponse({'error': 'Event date is already finalized'}, status=400)
 
+    if event.is_poll_closed:
+        return JsonResponse({'error': 'Voting has closed for this event'}, status=400)
+
     vote, created = DateVote.objects.get_or_create(
         user=request.user,
         date_option=date_option
@@ -187,6 +310,7 @@ def vote_date(request, event_id, date_option_id):
         voted = False
     else:
         voted = True
+        notify_votes(event, request.user)
 
     vote_count = date_option.votes.count()
 
@@ -199,42 +323,28 @@ def vote_date(request, event_id, date_option_id):
 @login_required
 @require_POST
 def finalize_event_date(request, event_id):
-    """Finalize the event date, or trigger wheel if tie"""
+    """Finalize the event on the most voted date, breaking any tie with the event's policy"""
     event = get_object_or_404(Event, id=event_id, creator=request.user)
 
     if event.is_date_finalized:
         messages.warning(request, "Event date is already finalized.")
         return redirect('eventpollapp:event_detail', event_id=event_id)
 
-    # If wheel already selected a date
-    selected_date_id = request.POST.get("selected_date")
-    if selected_date_id:
-        winning_option = get_object_or_404(DateOption, id=selected_date_id, event=event)
-        event.finalized_date = winning_option.proposed_date
-        event.is_date_finalized = True
-        event.save()
-        messages.success(request, f"Event date finalized for {event.finalized_date.strftime('%B %d, %Y at %I:%M %p')}!")
+    policy = request.POST.get('policy') or None
+    if policy is not None and policy not in tiebreak.POLICIES:
+        messages.error(request, "Unknown tie-break policy.")
         return redirect('eventpollapp:event_detail', event_id=event_id)
 
-    # Otherwise, check top-voted options
-    tied_options = event.get_top_voted_options()
-    if not tied_options:
+    winning_option = event.finalize_date(policy)
+    if winning_option is None:
         messages.error(request, "No date options available to finalize.")
         return redirect('eventpollapp:event_detail', event_id=event_id)
 
-    if len(tied_options) > 1:
-        # Render wheel page to break tie
-        return render(request, "eventpollapp/randomize_wheel.html", {
-            "event": event,
-            "tied_options": tied_options,
-        })
-
-    # Only one top option → finalize directly
-    winning_option = tied_options[0]
-    event.finalized_date = winning_option.proposed_date
-    event.is_date_finalized = True
-    event.save()
-    messages.success(request, f"Event date finalized for {event.finalized_date.strftime('%B %d, %Y at %I:%M %p')}!")
+    message = f"Event date finalized for {event.finalized_date.strftime('%B %d, %Y at %I:%M %p')}!"
+    tied = len(event.tiebreak_record['tied'])
+    if tied > 1:
+        message += f" {tied} dates were tied; picked by {event.get_tiebreak_policy_display().lower()}."
+    messages.success(request, message)
     return redirect('eventpollapp:event_detail', event_id=event_id)
 
 
@@ -297,14 +407,122 @@ def add_comment(request, event_id):
         messages.error(request, "You don't have permission to comment on this event.")
         return redirect('eventpollapp:event_detail', event_id=event_id)
 
+    wants_json = 'application/json' in request.headers.get('Accept', '')
     form = EventCommentForm(request.POST)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.event = event
         comment.user = request.user
         comment.save()
+        notify_comment(comment)
+        if wants_json:
+            # The page appends just this comment instead of reloading the thread
+            return JsonResponse({'comment': comment_json(request, comment)}, status=201)
         messages.success(request, 'Comment added!')
+    elif wants_json:
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    return redirect('eventpollapp:event_detail', event_id=event_id)
+
+
+def comments_fingerprint(request, event_id):
+    version = fragment_version(Event, event_id, 'comments')
+    return [version], version_timestamp(version)
+
+
+@login_required
+@conditional_page(comments_fingerprint)
+def event_comments(request, event_id):
+    """JSON page of comments: ?before=<id> for older ones, ?since=<id> for anything posted after the given id"""
+    event = get_object_or_404(Event, id=event_id)
+
+    can_access = (
+        event.creator == request.user or
+        event.required_role is None or
+        UserRole.objects.filter(user=request.user, role=event.required_role).exists()
+    )
+    if not can_access:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    try:
+        before = int(request.GET['before']) if 'before' in request.GET else None
+        since = int(request.GET['since']) if 'since' in request.GET else None
+        limit = min(max(int(request.GET.get('limit', COMMENTS_PAGE_SIZE)), 1), MAX_COMMENTS_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'before, since and limit must be integers'}, status=400)
+
+    comments = comment_page(event, get_user_loader(), before=before, since=since, limit=limit)
+    return JsonResponse({
+        'comments': [comment_json(request, comment) for comment in comments],
+        'has_more': comments.has_more,
+    })
+
+
+@login_required
+@require_POST
+def add_availability(request, event_id):
+    """Record a window of time the user is free for the event"""
+    event = get_object_or_404(Event, id=event_id)
+
+    can_access = (
+        event.creator == request.user or
+        event.required_role is None or
+        UserRole.objects.filter(user=request.user, role=event.required_role).exists()
+    )
+    if not can_access:
+        messages.error(request, "You don't have permission to view this event.")
+        return redirect('eventpollapp:event_list')
+
+    form = AvailabilityForm(request.POST)
+    if form.is_valid():
+        availability = form.save(commit=False)
+        availability.event = event
+        availability.user = request.user
+        availability.save()
+        messages.success(request, 'Availability added!')
+    else:
+        for error in form.errors.get('__all__', []) or ['Enter a valid start and end time.']:
+            messages.error(request, error)
+
+    return redirect('eventpollapp:event_detail', event_id=event_id)
+
 
+@login_required
+@require_POST
+def delete_availability(request, availability_id):
+    availability = get_object_or_404(Availability, id=availability_id, user=request.user)
+    event_id = availability.event_id
+    availability.delete()
+    return redirect('eventpollapp:event_detail', event_id=event_id)
+
+
+@login_required
+@require_POST
+def propose_slot(request, event_id):
+    """Add one of the suggested times as a date option to vote on"""
+    event = get_object_or_404(Event, id=event_id)
+
+    if event.creator != request.user:
+        messages.error(request, "Only the event creator can add date options.")
+        return redirect('eventpollapp:event_detail', event_id=event_id)
+
+    try:
+        proposed_date = datetime.fromisoformat(request.POST.get('start', ''))
+        if timezone.is_naive(proposed_date):
+            proposed_date = timezone.make_aware(proposed_date)
+    except ValueError:
+        messages.error(request, "Invalid date.")
+        return redirect('eventpollapp:event_detail', event_id=event_id)
+
+    _, created = DateOption.objects.get_or_create(
+        event=event,
+        proposed_date=proposed_date,
+        defaults={'proposed_by': request.user},
+    )
+    if created:
+        messages.success(request, 'Date option added!')
+    else:
+        messages.info(request, 'That time is already a date option.')
     return redirect('eventpollapp:event_detail', event_id=event_id)
 
 
@@ -356,3 +574,136 @@ def edit_event(request, event_id):
         form = EventForm(instance=event)
 
     return render(request, 'eventpollapp/edit_event.html', {'form': form, 'event': event})
+
+
+def calendar_feed_fingerprint(request, token):
+    user_id = ical.feed_user_id(token)
+    if user_id is None:
+        return None
+    version = ical.feed_version(user_id)
+    return [user_id, version], version_timestamp(version)
+
+
+@conditional_page(calendar_feed_fingerprint)
+def calendar_feed(request, token):
+    """The user's finalized events as an iCalendar feed; the token stands in for signing in"""
+    user_id = ical.feed_user_id(token)
+    if user_id is None:
+        raise Http404
+    base_url = request.build_absolute_uri('/').rstrip('/')
+    response = StreamingHttpResponse(
+        ical.stream_feed(user_id, ical.feed_version(user_id), base_url), content_type=ICS_CONTENT_TYPE
+    )
+    response['Content-Disposition'] = 'inline; filename="gather-ed.ics"'
+    return response
+
+
+def event_ics_fingerprint(request, event_id):
+    updated_at = Event.objects.filter(pk=event_id, is_date_finalized=True).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    version = fragment_version(Event, event_id, 'occurrences')
+    return [updated_at.isoformat(), version], max(updated_at, version_timestamp(version))
+
+
+@login_required
+@conditional_page(event_ics_fingerprint)
+def event_ics(request, event_id):
+    """Download a finalized event as a .ics file"""
+    event = get_object_or_404(Event, id=event_id, is_date_finalized=True)
+
+    can_access = (
+        event.creator == request.user or
+        event.required_role is None or
+        UserRole.objects.filter(user=request.user, role=event.required_role).exists()
+    )
+    if not can_access:
+        messages.error(request, "You don't have permission to view this event.")
+        return redirect('eventpollapp:event_list')
+
+    base_url = request.build_absolute_uri('/').rstrip('/')
+    response = HttpResponse(''.join(ical.calendar_chunks([event], base_url, event.title)), content_type=ICS_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="event-{event.id}.ics"'
+    return response
+
+
+@login_required
+@require_POST
+def edit_occurrence(request, event_id):
+    """Move, cancel or restore one occurrence of a recurring event"""
+    event = get_object_or_404(Event, id=event_id, creator=request.user)
+    original_start = parse_datetime(request.POST.get('original_start', ''))
+    if not event.rule or original_start is None or not event.rule.includes(event.finalized_date, original_start):
+        messages.error(request, "That date isn't part of this event's series.")
+        return redirect('eventpollapp:event_detail', event_id=event.id)
+
+    action = request.POST.get('action')
+    when = timezone.localtime(original_start).strftime('%b %d')
+    if action == 'restore':
+        EventOccurrence.objects.filter(event=event, original_start=original_start).delete()
+        messages.success(request, f"The {when} meetup is back to its usual time.")
+    elif action == 'cancel':
+        EventOccurrence.objects.update_or_create(
+            event=event, original_start=original_start, defaults={'is_cancelled': True}
+        )
+        messages.success(request, f"The {when} meetup was cancelled.")
+    else:
+        override = (
+            EventOccurrence.objects.filter(event=event, original_start=original_start).first()
+            or EventOccurrence(event=event, original_start=original_start)
+        )
+        form = EventOccurrenceForm(request.POST, instance=override)
+        if form.is_valid():
+            override = form.save(commit=False)
+            override.is_cancelled = False
+            if override.start == original_start:
+                override.start = None
+            override.save()
+            messages.success(request, f"The {when} meetup was updated.")
+        else:
+            messages.error(request, "Couldn't update that date.")
+    return redirect('eventpollapp:event_detail', event_id=event.id)
+
+
+@login_required
+def archived_event_list(request):
+    """Past events the user created or took part in, now in the archive"""
+    archived_events = request.user.archived_events.select_related('creator').defer('data')
+    page_obj = Paginator(archived_events, ARCHIVED_EVENTS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'eventpollapp/archived_event_list.html', {
+        'archived_events': page_obj,
+        'page_obj': page_obj,
+    })
+
+
+@login_required
+def archived_event_detail(request, event_id):
+    """Read-only view of an archived event, rebuilt from its stored snapshot"""
+    archived = get_object_or_404(ArchivedEvent, id=event_id)
+
+    can_access = (
+        archived.creator_id == request.user.id or
+        archived.required_role_id is None or
+        UserRole.objects.filter(user=request.user, role_id=archived.required_role_id).exists()
+    )
+    if not can_access:
+        messages.error(request, "You don't have permission to view this event.")
+        return redirect('eventpollapp:event_list')
+
+    snapshot = archive.unpack(archived.data)
+    for option in snapshot['date_options']:
+        option['vote_count'] = len(option['votes'])
+    snapshot['date_options'].sort(key=lambda option: -option['vote_count'])
+
+    return render(request, 'eventpollapp/archived_event_detail.html', {'archived': archived, 'snapshot': snapshot})
+
+
+@login_required
+@require_POST
+def reset_calendar_token(request):
+    """Give the user a new feed URL, cutting off anyone who had the old one"""
+    profile = request.user.profile
+    ical.forget_token(profile.calendar_token)
+    Profile.objects.filter(pk=profile.pk).update(calendar_token=new_calendar_token())
+    messages.success(request, "Your calendar feed link was reset. Subscribe again with the new link.")
+    return redirect('eventpollapp:dashboard')
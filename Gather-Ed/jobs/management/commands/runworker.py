@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import work
+
+
+def _worker_main(worker_id, batch_size, sleep, once):
+    # Each forked process must open its own database connection
+    connections.close_all()
+    try:
+        work(worker_id, batch_size=batch_size, sleep=sleep, once=once)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        batch_size = options['batch_size']
+        sleep = options['sleep']
+        once = options['once']
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        if processes == 1:
+            self.stdout.write(f"Starting worker {prefix}")
+            try:
+                work(f"{prefix}:0", batch_size=batch_size, sleep=sleep, once=once)
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # Don't share the parent's connection with forked children
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(
+                target=_worker_main,
+                args=(f"{prefix}:{i}", batch_size, sleep, once),
+                daemon=True,
+            )
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {processes} workers ({prefix})")
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,176 @@
+# Path: jobs/queue.py
+
+import logging
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Jobs stuck in RUNNING longer than this are assumed to belong to a dead worker;
+# tasks that legitimately run longer pass their own ``stale_after`` to @task
+STALE_AFTER = timedelta(minutes=10)
+# How often a running worker looks for jobs abandoned by others
+STALE_CHECK_INTERVAL = 60  # seconds
+RETRY_BASE_DELAY = 5  # seconds, doubled on each attempt
+
+_registry = {}
+
+
+def task(func=None, *, name=None, max_attempts=3, stale_after=STALE_AFTER):
+    """Register a function as a background task.
+
+    Tasks are addressed by name ('<app>.<function>' by default) and called
+    with the job payload as keyword arguments, so payloads must be JSON-serializable.
+    A job running longer than ``stale_after`` is handed to another worker.
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__.split('.')[0]}.{func.__name__}"
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        func.stale_after = stale_after
+        _registry[task_name] = func
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(name, payload=None, *, key=None, delay=None, max_attempts=None):
+    """Queue a job in the current transaction.
+
+    The row commits (or rolls back) together with the write that caused it.
+    With an idempotency ``key`` an existing job for that key is returned
+    instead of queueing a duplicate.
+    """
+    func = get_task(name)
+    if max_attempts is None:
+        max_attempts = func.max_attempts if func else 3
+
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'max_attempts': max_attempts,
+        'run_at': timezone.now() + (delay or timedelta()),
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+
+    existing = Job.objects.filter(idempotency_key=key).first()
+    if existing:
+        return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=key, **fields)
+    except IntegrityError:
+        # Lost a race with another request queueing the same key
+        return Job.objects.get(idempotency_key=key)
+
+
+def release_stale_jobs():
+    """Put jobs abandoned by crashed workers back in the queue"""
+    now = timezone.now()
+    custom = {name: func.stale_after for name, func in _registry.items() if func.stale_after != STALE_AFTER}
+    stale = Q(locked_at__lt=now - STALE_AFTER) & ~Q(name__in=custom)
+    for name, stale_after in custom.items():
+        stale |= Q(name=name, locked_at__lt=now - stale_after)
+    return Job.objects.filter(stale, status=Job.RUNNING).update(status=Job.PENDING, locked_by='', locked_at=None)
+
+
+def claim_jobs(worker_id, limit=10):
+    """Atomically claim up to ``limit`` due jobs for this worker.
+
+    Uses a conditional UPDATE rather than SELECT ... FOR UPDATE so it works on SQLite too;
+    concurrent workers can never claim the same row twice.
+    """
+    now = timezone.now()
+    ids = list(
+        Job.objects.filter(status=Job.PENDING, run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+
+    token = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+    Job.objects.filter(id__in=ids, status=Job.PENDING).update(
+        status=Job.RUNNING, locked_by=token, locked_at=now
+    )
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Execute a claimed job and record the outcome, scheduling a retry on failure"""
+    job.attempts += 1
+    func = get_task(job.name)
+    # The batch was locked when it was claimed; restart the stale clock now that this job begins
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(locked_at=timezone.now())
+    try:
+        if func is None:
+            raise LookupError(f"No task registered as '{job.name}'")
+        func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            logger.error("Job %s #%s failed permanently after %s attempts", job.name, job.id, job.attempts)
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+            logger.warning("Job %s #%s failed, retrying at %s", job.name, job.id, job.run_at)
+    else:
+        job.status = Job.DONE
+        job.last_error = ''
+
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'attempts', 'run_at', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+    return job.status == Job.DONE
+
+
+def run_pending(worker_id='inline', batch_size=10, limit=None):
+    """Drain due jobs in the current process; returns the number of jobs run.
+
+    This is what the worker loop calls, and what tests use to run the worker in-process.
+    """
+    processed = 0
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        jobs = claim_jobs(worker_id, size)
+        if not jobs:
+            break
+        for job in jobs:
+            run_job(job)
+            processed += 1
+    return processed
+
+
+def work(worker_id, batch_size=10, sleep=1.0, once=False):
+    """Worker loop: poll for due jobs until interrupted (or the queue is empty with ``once``)
+
+    Jobs left RUNNING by a worker that died are released every STALE_CHECK_INTERVAL, so
+    they're picked up again without restarting the workers.
+    """
+    last_check = None
+    while True:
+        close_old_connections()
+        if last_check is None or time.monotonic() - last_check >= STALE_CHECK_INTERVAL:
+            release_stale_jobs()
+            last_check = time.monotonic()
+        processed = run_pending(worker_id, batch_size)
+        if once and not processed:
+            return
+        if not processed:
+            time.sleep(sleep)
@@ -0,0 +1,130 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import RETRY_BASE_DELAY, STALE_AFTER, claim_jobs, enqueue, release_stale_jobs, run_pending, task
+
+calls = []
+
+
+@task(name='jobs.test_record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='jobs.test_fail', max_attempts=3)
+def fail():
+    raise RuntimeError('boom')
+
+
+@task(name='jobs.test_slow', stale_after=timedelta(hours=1))
+def slow():
+    pass
+
+
+class EnqueueTests(TestCase):
+    def test_enqueue_creates_pending_job(self):
+        job = enqueue('jobs.test_record', {'value': 1})
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.payload, {'value': 1})
+        self.assertEqual(job.max_attempts, 3)
+
+    def test_idempotency_key_returns_existing_job(self):
+        first = enqueue('jobs.test_record', {'value': 1}, key='record:1')
+        second = enqueue('jobs.test_record', {'value': 2}, key='record:1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(Job.objects.get().payload, {'value': 1})
+
+    def test_delay_postpones_job(self):
+        enqueue('jobs.test_record', {'value': 1}, delay=timedelta(minutes=5))
+        self.assertEqual(run_pending(), 0)
+
+
+class ClaimTests(TestCase):
+    def test_claim_marks_jobs_running_for_one_worker(self):
+        job = enqueue('jobs.test_record', {'value': 1})
+        claimed = claim_jobs('worker-a')
+        self.assertEqual([claimed_job.pk for claimed_job in claimed], [job.pk])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertTrue(job.locked_by.startswith('worker-a:'))
+        self.assertIsNotNone(job.locked_at)
+
+        # The conditional UPDATE only matches pending rows, so a second worker gets nothing
+        self.assertEqual(claim_jobs('worker-b'), [])
+
+    def test_claim_respects_limit_and_order(self):
+        later = enqueue('jobs.test_record', {'value': 2})
+        earlier = enqueue('jobs.test_record', {'value': 1})
+        Job.objects.filter(pk=earlier.pk).update(run_at=timezone.now() - timedelta(minutes=1))
+        claimed = claim_jobs('worker-a', limit=1)
+        self.assertEqual([job.pk for job in claimed], [earlier.pk])
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.PENDING)
+
+
+class StaleTests(TestCase):
+    def claim(self, name, minutes_ago):
+        job = enqueue(name, {'value': 1} if name == 'jobs.test_record' else {})
+        claim_jobs('worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return job
+
+    def test_releases_jobs_past_the_cutoff(self):
+        stale = self.claim('jobs.test_record', STALE_AFTER.total_seconds() / 60 + 1)
+        fresh = self.claim('jobs.test_record', 1)
+        self.assertEqual(release_stale_jobs(), 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.PENDING)
+        self.assertEqual(stale.locked_by, '')
+        self.assertEqual(Job.objects.get(pk=fresh.pk).status, Job.RUNNING)
+
+    def test_task_stale_after_overrides_the_default(self):
+        job = self.claim('jobs.test_slow', STALE_AFTER.total_seconds() / 60 + 1)
+        self.assertEqual(release_stale_jobs(), 0)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(release_stale_jobs(), 1)
+
+
+class RunTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_registered_task_runs(self):
+        job = enqueue('jobs.test_record', {'value': 'hello'})
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ['hello'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, '')
+
+    def test_failures_back_off_then_fail(self):
+        job = enqueue('jobs.test_fail')
+        for attempt in (1, 2):
+            before = timezone.now()
+            self.assertEqual(run_pending(), 1)
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.PENDING)
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('RuntimeError: boom', job.last_error)
+            # 5s, then 10s
+            delay = timedelta(seconds=RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            self.assertGreaterEqual(job.run_at, before + delay)
+            self.assertEqual(run_pending(), 0)
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(run_pending(), 0)
+
+    def test_unknown_task_fails(self):
+        job = enqueue('jobs.missing', max_attempts=1)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("No task registered as 'jobs.missing'", job.last_error)
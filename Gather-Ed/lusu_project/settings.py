@@ -19,6 +19,9 @@ INSTALLED_APPS = [
     'accounts',
     'eventpollapp',
     'bills',
+    'jobs',
+    'api',
+    'notifications',
 ]
 
 MIDDLEWARE = [
@@ -27,6 +30,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.UserLoaderMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +92,19 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Local memory by default (per process). Set CACHE_BACKEND/CACHE_LOCATION to a shared cache in production,
+# e.g. django.core.cache.backends.redis.RedisCache and redis://127.0.0.1:6379, so every worker sees the
+# same cached fragments and version counters.
+_cache = {
+    'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+}
+CACHES = {
+    'default': _cache,
+    # Used by {% cache %}; see accounts/fragments.py
+    'template_fragments': {**_cache, 'KEY_PREFIX': 'tf'},
+}
+
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
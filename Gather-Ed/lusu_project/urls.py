@@ -10,6 +10,8 @@ urlpatterns = [
     #path('events/', include('eventpollapp.urls')),
     path('bills/', include('bills.urls')),
     path('dashboard/', include('eventpollapp.urls')),
+    path('api/', include('api.urls')),
+    path('notifications/', include('notifications.urls')),
     path('', lambda request: redirect('accounts:login')),
 ]
 
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import Notification, UnreadCounter
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'verb', 'subject', 'count', 'is_read', 'updated_at']
+    list_filter = ['verb', 'is_read', 'updated_at']
+    search_fields = ['recipient__username', 'subject', 'group_key']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(UnreadCounter)
+class UnreadCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread']
+    search_fields = ['user__username']
@@ -0,0 +1,122 @@
+# Path: notifications/delivery.py
+
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from eventpollapp.models import EventParticipant
+from jobs.queue import enqueue
+from .models import Notification, UnreadCounter
+
+BATCH_SIZE = 1000
+
+
+def notify(verb, recipient_ids, actor, *, key, subject='', url='', count=1):
+    """Queue a notification for everyone in ``recipient_ids`` except the actor.
+
+    The fan-out runs on the job worker once the current transaction commits (the job row
+    commits with it), so a comment on a busy event doesn't write hundreds of rows in the request.
+    """
+    recipient_ids = sorted(set(recipient_ids) - {actor.id})
+    if not recipient_ids or count < 1:
+        return None
+    return enqueue('notifications.deliver_notification', {
+        'verb': verb,
+        'recipient_ids': recipient_ids,
+        'actor_id': actor.id,
+        'key': key,
+        'subject': subject[:200],
+        'url': url,
+        'count': count,
+    })
+
+
+def deliver(verb, recipient_ids, actor_id, key, subject='', url='', count=1):
+    """Fan a notification out to its recipients.
+
+    Recipients who still have an unread notification with the same key get that row's
+    count bumped ("12 new votes") instead of a new row; everyone else gets a new row,
+    and their unread counters go up by one. Returns how many rows were created.
+
+    The unique constraint on unread (recipient, group_key) does the coalescing: every
+    recipient's row is inserted with a count of 0 and conflicts are ignored, so the rows
+    still at 0 are exactly the ones this call created, even with several workers
+    delivering the same key at once. One UPDATE then adds the count to all of them.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=user_id, actor_id=actor_id, verb=verb, group_key=key,
+                    subject=subject, url=url, count=0,
+                )
+                for user_id in recipient_ids
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        unread = Notification.objects.filter(recipient_id__in=recipient_ids, group_key=key, is_read=False)
+        fresh = list(unread.filter(count=0).values_list('recipient_id', flat=True))
+        unread.update(count=F('count') + count, actor_id=actor_id, subject=subject, url=url, updated_at=now)
+        if fresh:
+            UnreadCounter.add(fresh)
+    return len(fresh)
+
+
+def mark_read(user_id, notification_id):
+    """Mark one notification read; returns False if it was already read or isn't the user's"""
+    with transaction.atomic():
+        updated = Notification.objects.filter(
+            pk=notification_id, recipient_id=user_id, is_read=False
+        ).update(is_read=True)
+        if updated:
+            UnreadCounter.subtract(user_id)
+    return bool(updated)
+
+
+def mark_all_read(user_id):
+    with transaction.atomic():
+        updated = Notification.objects.filter(recipient_id=user_id, is_read=False).update(is_read=True)
+        UnreadCounter.objects.filter(user_id=user_id).update(unread=0)
+    return updated
+
+
+def _event_audience(event):
+    """The creator and everyone taking part who hasn't said they're not going"""
+    participants = EventParticipant.objects.filter(event=event).exclude(status='not_going')
+    return {event.creator_id, *participants.values_list('user_id', flat=True)}
+
+
+def notify_comment(comment):
+    event = comment.event
+    notify(
+        Notification.COMMENT, _event_audience(event), comment.user,
+        key=f"comment:event:{event.id}", subject=event.title,
+        url=reverse('eventpollapp:event_detail', args=[event.id]),
+    )
+
+
+def notify_votes(event, voter, count=1):
+    """New votes are only the creator's business, who decides when to finalize"""
+    notify(
+        Notification.VOTE, [event.creator_id], voter,
+        key=f"vote:event:{event.id}", subject=event.title,
+        url=reverse('eventpollapp:event_detail', args=[event.id]), count=count,
+    )
+
+
+def notify_friend_request(friendship):
+    notify(
+        Notification.FRIEND_REQUEST, [friendship.to_user_id], friendship.from_user,
+        key='friend_request', url=reverse('accounts:friends'),
+    )
+
+
+def notify_settlement(settlement):
+    notify(
+        Notification.SETTLEMENT, [settlement.to_user_id], settlement.from_user,
+        key=f"settlement:bill:{settlement.bill_id}", subject=settlement.bill.title,
+        url=reverse('bills:settlement_inbox'),
+    )
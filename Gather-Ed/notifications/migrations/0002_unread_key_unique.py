@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fold_duplicate_unread(apps, schema_editor):
+    # Concurrent deliveries could leave two unread rows for one key; keep the newest with the combined count
+    Notification = apps.get_model('notifications', 'Notification')
+    UnreadCounter = apps.get_model('notifications', 'UnreadCounter')
+    duplicates = Notification.objects.filter(is_read=False).order_by().values('recipient_id', 'group_key').annotate(
+        rows=Count('id'), total=Sum('count')
+    ).filter(rows__gt=1)
+    recipients = set()
+    for row in duplicates:
+        unread = Notification.objects.filter(
+            recipient_id=row['recipient_id'], group_key=row['group_key'], is_read=False
+        ).order_by('-updated_at', '-id')
+        keep = unread.first()
+        unread.exclude(pk=keep.pk).delete()
+        Notification.objects.filter(pk=keep.pk).update(count=row['total'])
+        recipients.add(row['recipient_id'])
+    for user_id in recipients:
+        unread = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        UnreadCounter.objects.update_or_create(user_id=user_id, defaults={'unread': unread})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_duplicate_unread, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_unread_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False)), fields=('recipient', 'group_key'), name='notification_unread_key'),
+        ),
+    ]
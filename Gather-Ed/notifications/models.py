@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import F
+
+
+class Notification(models.Model):
+    """Something a user should know about; bursts on the same thing share one unread row (see delivery.py)"""
+    COMMENT = 'comment'
+    VOTE = 'vote'
+    FRIEND_REQUEST = 'friend_request'
+    SETTLEMENT = 'settlement'
+
+    VERB_CHOICES = [
+        (COMMENT, 'Comment'),
+        (VOTE, 'Vote'),
+        (FRIEND_REQUEST, 'Friend request'),
+        (SETTLEMENT, 'Settlement'),
+    ]
+
+    # verb -> (message for one, message for a coalesced burst)
+    MESSAGES = {
+        COMMENT: ('{actor} commented on {subject}', '{count} new comments on {subject}'),
+        VOTE: ('{actor} voted on dates for {subject}', '{count} new votes on {subject}'),
+        FRIEND_REQUEST: ('{actor} sent you a friend request', '{count} new friend requests'),
+        SETTLEMENT: ('{actor} sent you a payment on {subject}', '{count} payments to confirm on {subject}'),
+    }
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # The most recent person behind it
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    # What the notification is about, e.g. 'vote:event:12'; unread rows with the same key are coalesced
+    group_key = models.CharField(max_length=100)
+    subject = models.CharField(max_length=200, blank=True)
+    url = models.CharField(max_length=300, blank=True)
+    count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at'], name='notification_inbox_idx'),
+        ]
+        constraints = [
+            # At most one unread row per key, so concurrent deliveries coalesce instead of duplicating
+            models.UniqueConstraint(
+                fields=['recipient', 'group_key'], condition=models.Q(is_read=False), name='notification_unread_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient.username}: {self.message}"
+
+    @property
+    def message(self):
+        one, many = self.MESSAGES[self.verb]
+        actor = self.actor.username if self.actor_id else 'Someone'
+        return (one if self.count == 1 else many).format(actor=actor, subject=self.subject, count=self.count)
+
+
+class UnreadCounter(models.Model):
+    """Number of unread notifications per user, kept in step by delivery and mark-as-read so the
+    badge is a primary-key read instead of a COUNT(*)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+    @classmethod
+    def get(cls, user_id):
+        return cls.objects.filter(user_id=user_id).values_list('unread', flat=True).first() or 0
+
+    @classmethod
+    def add(cls, user_ids, amount=1):
+        cls.objects.bulk_create([cls(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        cls.objects.filter(user_id__in=user_ids).update(unread=F('unread') + amount)
+
+    @classmethod
+    def subtract(cls, user_id, amount=1):
+        cls.objects.filter(user_id=user_id, unread__gte=amount).update(unread=F('unread') - amount)
+
+    @classmethod
+    def recount(cls, user_id):
+        """Reset the counter from the notifications themselves"""
+        unread = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cls.objects.update_or_create(user_id=user_id, defaults={'unread': unread})
+        return unread
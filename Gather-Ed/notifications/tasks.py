@@ -0,0 +1,10 @@
+# Path: notifications/tasks.py
+
+from jobs.queue import task
+from .delivery import deliver
+
+
+@task
+def deliver_notification(verb, recipient_ids, actor_id, key, subject='', url='', count=1):
+    """Fan out a notification queued by delivery.notify()"""
+    deliver(verb, recipient_ids, actor_id, key, subject, url, count)
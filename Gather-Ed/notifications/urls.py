@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+app_name = 'notifications'
+
+urlpatterns = [
+    path('', views.notification_list, name='notification_list'),
+    path('<int:notification_id>/open/', views.open_notification, name='open_notification'),
+    path('read-all/', views.read_all, name='read_all'),
+    path('unread-count/', views.unread_count, name='unread_count'),
+]
@@ -0,0 +1,40 @@
+# Path: notifications/views.py
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+from .delivery import mark_all_read, mark_read
+from .models import Notification, UnreadCounter
+
+NOTIFICATIONS_SHOWN = 50
+
+
+@login_required
+def notification_list(request):
+    notifications = Notification.objects.filter(recipient=request.user).select_related('actor')[:NOTIFICATIONS_SHOWN]
+    return render(request, 'notifications/notification_list.html', {'notifications': notifications})
+
+
+@login_required
+def open_notification(request, notification_id):
+    """Mark a notification read and go to what it is about"""
+    mark_read(request.user.id, notification_id)
+    url = Notification.objects.filter(pk=notification_id, recipient=request.user).values_list('url', flat=True).first()
+    if url and url_has_allowed_host_and_scheme(url, allowed_hosts={request.get_host()}):
+        return redirect(url)
+    return redirect('notifications:notification_list')
+
+
+@login_required
+@require_POST
+def read_all(request):
+    mark_all_read(request.user.id)
+    return redirect('notifications:notification_list')
+
+
+@login_required
+def unread_count(request):
+    """The navbar badge, polled by every page; read from the per-user counter, not COUNT(*)"""
+    return JsonResponse({'unread': UnreadCounter.get(request.user.id)})